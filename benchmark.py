@@ -0,0 +1,145 @@
+"""
+Benchmarks for the tree operations at increasing tree sizes.
+
+Each operation runs on a complete tree of the given size, either on a
+NullScene (logic only, nothing rendered) or on a real Scene rendered at
+Manim's lowest quality. Wall time is reported next to the number of
+scene.play calls, animations and mobjects the operation produced.
+
+    python benchmark.py
+    python benchmark.py --render --sizes 15 63 255 --render-sizes 15 63
+    python benchmark.py --ops build_batched left_rotate --json results.json
+"""
+import argparse
+import json
+import tempfile
+import time
+
+from manim import Scene, tempconfig
+
+from rbtree import *
+
+TREE_KWARGS = {"radius": 0.3, "h_spacing": 5.0, "v_spacing": 1.0}
+
+
+def tree_list(size):
+    """Heap-ordered build_tree_from_list data for a tree of size nodes"""
+    return ["B%d" % index for index in range(1, size + 1)]
+
+
+# name -> (function(scene, tree, data), whether the tree is built beforehand)
+OPERATIONS = {
+    "build": (lambda scene, tree, data: build_tree_from_list(tree, data), False),
+    "build_batched": (lambda scene, tree, data: build_tree_from_list(tree, data, batched=True), False),
+    "left_rotate": (lambda scene, tree, data: left_rotate(scene, tree, 1), True),
+    "right_rotate": (lambda scene, tree, data: right_rotate(scene, tree, 1), True),
+    "delete_leaf": (lambda scene, tree, data: delete_node(scene, tree, len(data)), True),
+    "delete_internal": (lambda scene, tree, data: delete_node(scene, tree, 2), True),
+    "rebuild_edges": (lambda scene, tree, data: tree.rebuild_edges(), True),
+    "move_tree": (lambda scene, tree, data: tree.move_tree(dx=1, dy=0, scale_factor=0.8), True),
+}
+
+
+def _measure(scene, operation, size, count_plays):
+    """Build the tree if needed, then time one operation on it"""
+    function, prebuilt = OPERATIONS[operation]
+    data = tree_list(size)
+    tree = TreeStructure(scene, **TREE_KWARGS)
+    if prebuilt:
+        build_tree_from_list(tree, data, batched=True)
+
+    plays_before, animations_before = count_plays()
+    start = time.perf_counter()
+    function(scene, tree, data)
+    wall_time = time.perf_counter() - start
+    plays_after, animations_after = count_plays()
+
+    return {
+        "wall_time": wall_time,
+        "plays": plays_after - plays_before,
+        "animations": animations_after - animations_before,
+        "mobjects": len(scene.mobjects),
+    }
+
+
+def run_null(operation, size):
+    scene = NullScene()
+    return _measure(scene, operation, size, lambda: (scene.play_count, scene.animation_count))
+
+
+class BenchmarkScene(Scene):
+    """Renders one benchmark operation; the measurement ends up in self.result"""
+    operation = None
+    size = 0
+
+    def setup(self):
+        self.play_count = 0
+        self.animation_count = 0
+        self.result = None
+
+    def play(self, *animations, **kwargs):
+        self.play_count += 1
+        self.animation_count += len(animations)
+        super().play(*animations, **kwargs)
+
+    def construct(self):
+        self.result = _measure(self, self.operation, self.size,
+                               lambda: (self.play_count, self.animation_count))
+
+
+def run_render(operation, size):
+    with tempfile.TemporaryDirectory() as media_dir:
+        with tempconfig({"quality": "low_quality", "media_dir": media_dir,
+                         "disable_caching": True, "progress_bar": "none", "verbosity": "WARNING"}):
+            scene = BenchmarkScene()
+            scene.operation = operation
+            scene.size = size
+            scene.render()
+    return scene.result
+
+
+def run_benchmarks(operations, sizes, render_sizes=(), repeat=1):
+    """Run every operation at every size and return one result dict per measurement"""
+    results = []
+    modes = [("null", run_null, sizes), ("render", run_render, render_sizes)]
+    for mode, runner, mode_sizes in modes:
+        for operation in operations:
+            for size in mode_sizes:
+                # Keep the fastest run; counts are the same every time
+                runs = [runner(operation, size) for _ in range(repeat)]
+                best = min(runs, key=lambda run: run["wall_time"])
+                results.append(dict(best, mode=mode, operation=operation, size=size))
+    return results
+
+
+def print_table(results):
+    print("%-7s %-16s %7s %12s %7s %11s %9s" % ("mode", "operation", "size", "time (ms)", "plays", "animations", "mobjects"))
+    for result in results:
+        print("%-7s %-16s %7d %12.2f %7d %11d %9d" % (
+            result["mode"], result["operation"], result["size"], result["wall_time"] * 1000,
+            result["plays"], result["animations"], result["mobjects"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tree operations at increasing sizes")
+    parser.add_argument("--ops", nargs="+", choices=sorted(OPERATIONS), default=list(OPERATIONS),
+                        help="operations to run (default: all)")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[15, 63, 255, 1023],
+                        help="tree sizes for the no-render mode")
+    parser.add_argument("--render", action="store_true",
+                        help="also render each operation at Manim's lowest quality")
+    parser.add_argument("--render-sizes", nargs="+", type=int, default=[15, 63],
+                        help="tree sizes for the render mode")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement, the fastest is kept")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.ops, args.sizes, args.render_sizes if args.render else (), args.repeat)
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
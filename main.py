@@ -1,3 +1,4 @@
+from rbmodel import RBTreeModel
 from rbtree import *
 
 class BasicTreeExample(Scene):
@@ -85,6 +86,12 @@ class ArrowDemo(Scene):
                 arrow.create_arrow(index) if index == 1 else arrow.move_to(index)
                 self.wait(1)
         
+        # Search for a key: the arrow slides down the whole path in one move
+        arrow.move_to(1)
+        self.wait(0.5)
+        arrow.follow_search(10, total_time=2.0)
+        self.wait(1)
+        
         arrow.remove()
         self.wait(1)
 
@@ -265,20 +272,13 @@ class ComplexOperationsDemo(Scene):
         self.play(Write(subtree_text), run_time=1)
         
         subtree_nodes = collect_subtree_nodes(tree, 2)
-        highlights = []
         colors = [BLUE, PURPLE, ORANGE, PINK, TEAL]
-        
-        for i, node_idx in enumerate(subtree_nodes):
-            color = colors[i % len(colors)]
-            highlight = tree.highlight_node(node_idx, color=color, duration=0.3)
-            highlights.append(highlight)
-            self.wait(0.3)
+        highlights = tree.highlight_nodes(subtree_nodes, colors, duration=0.3)
         
         self.wait(2)
         
         # Remove all highlights
-        for highlight in highlights:
-            tree.remove_highlight(highlight, duration=0.2)
+        tree.remove_highlights(highlights, duration=0.2)
         
         self.wait(1)
 
@@ -311,10 +311,7 @@ class ComplexOperationsDemo(Scene):
         self.play(Transform(step1, step2), run_time=1)
         
         # Highlight red nodes
-        red_highlights = []
-        for idx in [2, 3]:  # Nodes 5 and 15
-            highlight = tree.highlight_node(idx, color=YELLOW, duration=0.5)
-            red_highlights.append(highlight)
+        red_highlights = tree.highlight_nodes([2, 3], YELLOW, duration=0.5)  # Nodes 5 and 15
         
         self.wait(2)
         
@@ -323,8 +320,7 @@ class ComplexOperationsDemo(Scene):
         self.play(Transform(step1, step3), run_time=1)
         
         # Remove highlights
-        for highlight in red_highlights:
-            tree.remove_highlight(highlight, duration=0.3)
+        tree.remove_highlights(red_highlights, duration=0.3)
         
         # Perform rotation
         left_rotate(self, tree, 1)
@@ -333,4 +329,49 @@ class ComplexOperationsDemo(Scene):
         # Step 4: Final result
         step4 = Text("Step 4: Balanced Red-Black Tree", font_size=24, color=GREEN)
         self.play(Transform(step1, step4), run_time=1)
-        self.wait(3)
\ No newline at end of file
+        self.wait(3)
+
+class ModelReplayDemo(Scene):
+    def construct(self):
+        """Red-black insertions and deletions driven by the headless model"""
+        title = Text("Red-Black Tree Model", font_size=32, color=WHITE)
+        title.to_edge(UP)
+        self.play(Write(title), run_time=1)
+        
+        tree = TreeStructure(self, radius=0.3, h_spacing=4, v_spacing=1.0)
+        model = RBTreeModel()
+        
+        # The model runs the red-black logic, the tree replays its steps
+        for key in [10, 20, 30, 15, 25, 5, 1]:
+            replay_steps(self, tree, model.insert(key))
+            self.wait(0.3)
+        
+        for key in [20, 10]:
+            replay_steps(self, tree, model.delete(key))
+            self.wait(0.5)
+        
+        self.wait(2)
+
+class LevelOfDetailDemo(Scene):
+    def construct(self):
+        """A large red-black tree drawn with collapsed subtrees"""
+        title = Text("Level of Detail", font_size=32, color=WHITE)
+        title.to_edge(UP)
+        self.play(Write(title), run_time=1)
+        
+        # Subtrees from depth 3 down are drawn as one summary triangle each
+        tree = TreeStructure(self, radius=0.25, h_spacing=5, v_spacing=1.0, root_pos=ORIGIN + 1.8 * UP,
+                             lod_depth=3)
+        model = RBTreeModel(record=False)
+        for key in range(1, 201):
+            model.insert(key)
+        tree.restore(model.to_tree_data())
+        self.wait(1)
+        
+        # Operations open up the subtrees they touch and collapse them again afterwards
+        model = RBTreeModel.from_tree_data(tree.full_tree_data())
+        for key in [201, 202, 203]:
+            replay_steps(self, tree, model.insert(key))
+            self.wait(0.5)
+        
+        self.wait(2)
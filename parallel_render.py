@@ -0,0 +1,306 @@
+"""
+Render the Scene subclasses of a module across a pool of worker processes.
+
+Each scene is rendered in its own worker with its own media directory, so
+workers never share partial movie files. Results and per-scene timings are
+collected into a JSON manifest.
+
+A single long operation script (a JSON list of ["insert", key] and
+["delete", key] operations) can also be split at checkpoints. The tree at
+every checkpoint is saved as a TreeStructure state file, each segment starts
+by loading its file without animation, and the rendered segments are joined
+with ffmpeg.
+
+    python parallel_render.py main.py --workers 4 --quality low_quality
+    python parallel_render.py main.py --scenes RotationDemo DeletionDemo
+    python parallel_render.py --script operations.json --segments 4 --output media/script.mp4
+"""
+import argparse
+import importlib.util
+import inspect
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from manim import Scene, tempconfig
+
+from rbmodel import RBTreeModel
+from rbtree import NullScene, TreeStructure, replay_steps
+
+QUALITIES = ["low_quality", "medium_quality", "high_quality", "production_quality", "fourk_quality"]
+
+
+def load_module(module_path):
+    """Import a Python file by path, with its directory importable (for `from rbtree import *`)"""
+    module_path = os.path.abspath(module_path)
+    directory = os.path.dirname(module_path)
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    name = os.path.splitext(os.path.basename(module_path))[0]
+    spec = importlib.util.spec_from_file_location(name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def discover_scenes(module):
+    """Names of the Scene subclasses defined in module (not just imported into it), in source order"""
+    scenes = [cls for cls in vars(module).values()
+              if inspect.isclass(cls) and issubclass(cls, Scene) and cls.__module__ == module.__name__]
+    scenes.sort(key=lambda cls: inspect.getsourcelines(cls)[1])
+    return [cls.__name__ for cls in scenes]
+
+
+def _render(entry, make_scene, media_dir, quality, config_overrides=None):
+    """Render the scene make_scene() returns under media_dir and fill in its manifest entry"""
+    entry["media_dir"] = media_dir
+    start = time.perf_counter()
+    try:
+        options = {"media_dir": media_dir, "quality": quality, "progress_bar": "none"}
+        options.update(config_overrides or {})
+        with tempconfig(options):
+            scene = make_scene()
+            scene.render()
+        entry["status"] = "ok"
+        entry["output"] = str(scene.renderer.file_writer.movie_file_path)
+    except Exception:
+        entry["status"] = "error"
+        entry["error"] = traceback.format_exc()
+    entry["wall_time"] = time.perf_counter() - start
+    return entry
+
+
+def render_scene(module_path, scene_name, media_dir, quality, config_overrides=None):
+    """Render one scene of a module in the current process and return its manifest entry"""
+    make_scene = lambda: getattr(load_module(module_path), scene_name)()
+    return _render({"scene": scene_name}, make_scene, media_dir, quality, config_overrides)
+
+
+def render_all(module_path, scene_names=None, workers=None, media_root="media/catalogue",
+               quality="low_quality", manifest_path=None):
+    """
+    Render scene_names (default: every scene in the module) across a process
+    pool and write a manifest with one entry per scene plus the total time.
+    """
+    if scene_names is None:
+        scene_names = discover_scenes(load_module(module_path))
+    workers = workers or os.cpu_count() or 1
+
+    start = time.perf_counter()
+    entries = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(render_scene, module_path, name, os.path.join(media_root, name), quality): name
+            for name in scene_names
+        }
+        for future in as_completed(futures):
+            entry = future.result()
+            entries[entry["scene"]] = entry
+            print("%-28s %-6s %8.1fs" % (entry["scene"], entry["status"], entry["wall_time"]))
+
+    manifest = {
+        "module": os.path.abspath(module_path),
+        "quality": quality,
+        "workers": workers,
+        "wall_time": time.perf_counter() - start,
+        "scenes": [entries[name] for name in scene_names],
+    }
+    manifest_path = manifest_path or os.path.join(media_root, "manifest.json")
+    os.makedirs(os.path.dirname(manifest_path) or ".", exist_ok=True)
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+class OperationScriptScene(Scene):
+    """
+    Renders a list of operations. With state_path the scene starts from a
+    tree saved by write_state, loaded without animation, so a segment looks
+    exactly like the same stretch of a full render. The model takes its sort
+    keys from the file's keys column; key turns labels into sort keys only
+    for files without one, such as those written by TreeStructure.save_state.
+    """
+    def __init__(self, operations=(), state_path=None, tree_kwargs=None, key=int, **kwargs):
+        super().__init__(**kwargs)
+        self.operations = list(operations)
+        self.state_path = state_path
+        self.tree_kwargs = tree_kwargs or {}
+        self.key = key
+
+    def construct(self):
+        tree = TreeStructure(self, **self.tree_kwargs)
+        keys = None
+        if self.state_path is not None:
+            with open(self.state_path) as f:
+                state = json.load(f)
+            tree.restore_state(state)
+            if "keys" in state:
+                keys = {index: key for (index, _, _), key in zip(state["nodes"], state["keys"])}
+        model = RBTreeModel.from_tree_data(tree.full_tree_data(), key=self.key, keys=keys)
+
+        for operation in self.operations:
+            replay_steps(self, tree, model.apply(operation))
+
+
+def split_points(operation_count, segments):
+    """Checkpoints that cut operation_count operations into segments nearly equal parts"""
+    segments = max(1, min(segments, operation_count))
+    return [operation_count * part // segments for part in range(1, segments)]
+
+
+def render_segment(operations, start, stop, media_dir, quality, tree_kwargs=None):
+    """
+    Render operations[start:stop] in the current process, starting from the
+    state file in media_dir, and return its manifest entry
+    """
+    state_path = os.path.join(media_dir, "state.json")
+    make_scene = lambda: OperationScriptScene(operations[start:stop], state_path, tree_kwargs)
+    return _render({"segment": [start, stop]}, make_scene, media_dir, quality)
+
+
+def empty_layout(tree_kwargs=None):
+    """The state of an empty tree built with tree_kwargs, for write_state"""
+    return TreeStructure(NullScene(), **(tree_kwargs or {})).export_state()
+
+
+def write_state(model, layout, media_dir):
+    """
+    Save the model's tree with the layout from empty_layout as
+    media_dir/state.json, with a keys column holding each node's sort key
+    """
+    nodes = sorted(model.to_tree_data().items())
+    keys = model.to_keys()
+    state = dict(layout, nodes=[[index, label, color_char] for index, (label, color_char) in nodes],
+                 keys=[keys[index] for index, _ in nodes])
+    os.makedirs(media_dir, exist_ok=True)
+    with open(os.path.join(media_dir, "state.json"), "w") as f:
+        json.dump(state, f, separators=(",", ":"))
+
+
+def save_checkpoints(operations, bounds, media_dirs, tree_kwargs=None):
+    """
+    Run the script once on the headless model and save the tree at each
+    segment start as a state file in that segment's media directory.
+    """
+    layout = empty_layout(tree_kwargs)
+    model = RBTreeModel(record=False)
+    done = 0
+    for start, media_dir in zip(bounds, media_dirs):
+        for operation in operations[done:start]:
+            model.apply(operation)
+        done = start
+        write_state(model, layout, media_dir)
+
+
+def concat_videos(paths, output):
+    """Join videos with identical encoding settings into output using ffmpeg's concat demuxer"""
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        raise RuntimeError("ffmpeg is needed to join the rendered segments")
+
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as listing:
+        for path in paths:
+            listing.write("file '%s'\n" % os.path.abspath(path).replace("'", "'\\''"))
+    try:
+        subprocess.run([ffmpeg, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+                        "-i", listing.name, "-c", "copy", output], check=True)
+    finally:
+        os.remove(listing.name)
+    return output
+
+
+def render_script(operations, output, checkpoints=None, workers=None, media_root="media/segments",
+                  quality="low_quality", tree_kwargs=None, manifest_path=None):
+    """
+    Render an operation script split at checkpoints (operation offsets;
+    default: one segment per worker) and join the segments into output.
+    """
+    operations = [tuple(operation) for operation in operations]
+    workers = workers or os.cpu_count() or 1
+    if checkpoints is None:
+        checkpoints = split_points(len(operations), workers)
+    bounds = [0] + sorted(set(point for point in checkpoints if 0 < point < len(operations))) + [len(operations)]
+    segments = list(zip(bounds, bounds[1:]))
+    media_dirs = [os.path.join(media_root, "segment_%03d" % number) for number in range(len(segments))]
+
+    start = time.perf_counter()
+    save_checkpoints(operations, bounds[:-1], media_dirs, tree_kwargs)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Each worker is sent only its own slice of the script
+        futures = [
+            executor.submit(render_segment, operations[first:stop], 0, stop - first, media_dir, quality,
+                            tree_kwargs)
+            for (first, stop), media_dir in zip(segments, media_dirs)
+        ]
+        entries = []
+        for future, (first, stop) in zip(futures, segments):
+            entry = future.result()
+            entry["segment"] = [first, stop]
+            entries.append(entry)
+            print("operations %5d-%-5d %-6s %8.1fs" % (entry["segment"][0], entry["segment"][1],
+                                                      entry["status"], entry["wall_time"]))
+
+    manifest = {
+        "operations": len(operations),
+        "quality": quality,
+        "workers": workers,
+        "segments": entries,
+    }
+    if all(entry["status"] == "ok" for entry in entries):
+        manifest["output"] = concat_videos([entry["output"] for entry in entries], output)
+    manifest["wall_time"] = time.perf_counter() - start
+
+    manifest_path = manifest_path or os.path.join(media_root, "manifest.json")
+    os.makedirs(os.path.dirname(manifest_path) or ".", exist_ok=True)
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a module's scenes in parallel")
+    parser.add_argument("module", nargs="?", default="main.py", help="Python file defining the scenes")
+    parser.add_argument("--scenes", nargs="+", help="scene names to render (default: all)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--quality", choices=QUALITIES, default="low_quality")
+    parser.add_argument("--media-dir", help="root of the per-scene or per-segment media directories "
+                                                    "(default: media/catalogue or media/segments)")
+    parser.add_argument("--manifest", help="manifest path (default: <media-dir>/manifest.json)")
+    parser.add_argument("--script", help="JSON operation script to render in segments instead of a module")
+    parser.add_argument("--segments", type=int, help="number of segments to split the script into (default: workers)")
+    parser.add_argument("--checkpoints", nargs="+", type=int, help="explicit operation offsets to split the script at")
+    parser.add_argument("--output", default="media/script.mp4", help="joined video of the script")
+    args = parser.parse_args()
+
+    if args.script:
+        with open(args.script) as f:
+            operations = json.load(f)
+        checkpoints = args.checkpoints
+        if checkpoints is None and args.segments:
+            checkpoints = split_points(len(operations), args.segments)
+        manifest = render_script(operations, args.output, checkpoints, args.workers, args.media_dir or "media/segments",
+                                 args.quality, manifest_path=args.manifest)
+        failed = ["%d-%d" % tuple(entry["segment"]) for entry in manifest["segments"] if entry["status"] != "ok"]
+        if not failed:
+            print("Rendered %d operations to %s in %.1fs" % (manifest["operations"], manifest["output"],
+                                                            manifest["wall_time"]))
+    else:
+        manifest = render_all(args.module, args.scenes, args.workers, args.media_dir or "media/catalogue",
+                              args.quality, args.manifest)
+        failed = [entry["scene"] for entry in manifest["scenes"] if entry["status"] != "ok"]
+        print("Rendered %d scenes in %.1fs" % (len(manifest["scenes"]) - len(failed), manifest["wall_time"]))
+    if failed:
+        print("Failed: %s" % ", ".join(failed))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,383 @@
+"""
+Headless red-black tree model.
+
+Runs the real red-black insert, delete and search logic without Manim so it can
+be driven at full speed. Every operation can also return the primitive steps
+TreeStructure needs to replay it, addressed with the same heap indices the
+visualization uses (root 1, children 2*i and 2*i+1):
+
+    ("insert", index, label, color_char)
+    ("recolor", index, color_char)
+    ("rotate_left", index)
+    ("rotate_right", index)
+    ("swap_values", index1, index2)
+    ("remove", index)      # node has at most one child, which moves up
+
+Pass record=False to skip building steps when only the final tree matters.
+"""
+
+RED = "R"
+BLACK = "B"
+
+
+class RBNode:
+    __slots__ = ("key", "label", "color", "left", "right", "parent")
+
+    def __init__(self, key, label, color=RED, parent=None):
+        self.key = key
+        self.label = label
+        self.color = color
+        self.left = None
+        self.right = None
+        self.parent = parent
+
+
+def _color(node):
+    """Color of a node, treating missing (nil) children as black"""
+    return node.color if node is not None else BLACK
+
+
+class RBTreeModel:
+    def __init__(self, record=True):
+        self.root = None
+        self.size = 0
+        self.record = record
+        self._steps = []
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, key):
+        return self.search(key) is not None
+
+    def index_of(self, node):
+        """Heap index of a node, found by walking up to the root"""
+        path = []
+        while node.parent is not None:
+            path.append(node is node.parent.right)
+            node = node.parent
+
+        index = 1
+        for is_right in reversed(path):
+            index = 2 * index + is_right
+        return index
+
+    def _take_steps(self):
+        steps = self._steps
+        self._steps = []
+        return steps
+
+    def _set_color(self, node, color_char):
+        if node.color != color_char:
+            node.color = color_char
+            if self.record:
+                self._steps.append(("recolor", self.index_of(node), color_char))
+
+    # Search
+
+    def search(self, key):
+        """Return the node holding key, or None"""
+        node = self.root
+        while node is not None and node.key != key:
+            node = node.left if key < node.key else node.right
+        return node
+
+    def search_path(self, key):
+        """Heap indices visited while searching for key, ending at the key if present"""
+        path = []
+        node = self.root
+        index = 1
+        while node is not None:
+            path.append(index)
+            if key == node.key:
+                break
+            if key < node.key:
+                node, index = node.left, 2 * index
+            else:
+                node, index = node.right, 2 * index + 1
+        return path
+
+    def minimum(self, node):
+        while node.left is not None:
+            node = node.left
+        return node
+
+    # Rotations
+
+    def _rotate_left(self, x):
+        if self.record:
+            self._steps.append(("rotate_left", self.index_of(x)))
+        y = x.right
+        x.right = y.left
+        if y.left is not None:
+            y.left.parent = x
+        self._replace_child(x, y)
+        y.left = x
+        x.parent = y
+
+    def _rotate_right(self, x):
+        if self.record:
+            self._steps.append(("rotate_right", self.index_of(x)))
+        y = x.left
+        x.left = y.right
+        if y.right is not None:
+            y.right.parent = x
+        self._replace_child(x, y)
+        y.right = x
+        x.parent = y
+
+    def _replace_child(self, old, new):
+        """Put new where old hangs from its parent"""
+        parent = old.parent
+        if new is not None:
+            new.parent = parent
+        if parent is None:
+            self.root = new
+        elif old is parent.left:
+            parent.left = new
+        else:
+            parent.right = new
+
+    # Insertion
+
+    def insert(self, key, label=None):
+        """Insert key and return the steps that replay it. Duplicate keys are ignored."""
+        label = str(key) if label is None else label
+        parent = None
+        node = self.root
+        while node is not None:
+            if key == node.key:
+                return self._take_steps()
+            parent = node
+            node = node.left if key < node.key else node.right
+
+        node = RBNode(key, label, RED, parent)
+        if parent is None:
+            self.root = node
+        elif key < parent.key:
+            parent.left = node
+        else:
+            parent.right = node
+        self.size += 1
+        if self.record:
+            self._steps.append(("insert", self.index_of(node), label, RED))
+
+        self._insert_fixup(node)
+        return self._take_steps()
+
+    def _insert_fixup(self, z):
+        while z.parent is not None and z.parent.color == RED:
+            parent = z.parent
+            grandparent = parent.parent
+            if parent is grandparent.left:
+                uncle = grandparent.right
+                if _color(uncle) == RED:
+                    # Case 1: red uncle, push blackness down from the grandparent
+                    self._set_color(parent, BLACK)
+                    self._set_color(uncle, BLACK)
+                    self._set_color(grandparent, RED)
+                    z = grandparent
+                    continue
+                if z is parent.right:
+                    # Case 2: inner child, rotate into the outer position
+                    z = parent
+                    self._rotate_left(z)
+                    parent = z.parent
+                # Case 3: outer child
+                self._set_color(parent, BLACK)
+                self._set_color(grandparent, RED)
+                self._rotate_right(grandparent)
+            else:
+                uncle = grandparent.left
+                if _color(uncle) == RED:
+                    self._set_color(parent, BLACK)
+                    self._set_color(uncle, BLACK)
+                    self._set_color(grandparent, RED)
+                    z = grandparent
+                    continue
+                if z is parent.left:
+                    z = parent
+                    self._rotate_right(z)
+                    parent = z.parent
+                self._set_color(parent, BLACK)
+                self._set_color(grandparent, RED)
+                self._rotate_left(grandparent)
+
+        self._set_color(self.root, BLACK)
+
+    # Deletion
+
+    def delete(self, key):
+        """Delete key and return the steps that replay it. Missing keys are ignored."""
+        z = self.search(key)
+        if z is None:
+            return self._take_steps()
+
+        if z.left is not None and z.right is not None:
+            # Two children: take the inorder successor's value, then delete the successor
+            successor = self.minimum(z.right)
+            if self.record:
+                self._steps.append(("swap_values", self.index_of(z), self.index_of(successor)))
+            z.key, successor.key = successor.key, z.key
+            z.label, successor.label = successor.label, z.label
+            z = successor
+
+        # z now has at most one child, which takes its place
+        if self.record:
+            self._steps.append(("remove", self.index_of(z)))
+        child = z.left if z.left is not None else z.right
+        parent = z.parent
+        self._replace_child(z, child)
+        self.size -= 1
+
+        if z.color == BLACK:
+            if _color(child) == RED:
+                self._set_color(child, BLACK)
+            else:
+                self._delete_fixup(child, parent)
+        return self._take_steps()
+
+    def _delete_fixup(self, x, parent):
+        """Resolve the extra black on x (possibly nil) hanging below parent"""
+        while x is not self.root and _color(x) == BLACK:
+            if x is parent.left:
+                sibling = parent.right
+                if sibling.color == RED:
+                    # Case 1: red sibling, rotate it above the parent
+                    self._set_color(sibling, BLACK)
+                    self._set_color(parent, RED)
+                    self._rotate_left(parent)
+                    sibling = parent.right
+                if _color(sibling.left) == BLACK and _color(sibling.right) == BLACK:
+                    # Case 2: black sibling with black children, move the extra black up
+                    self._set_color(sibling, RED)
+                    x = parent
+                    parent = x.parent
+                    continue
+                if _color(sibling.right) == BLACK:
+                    # Case 3: only the inner nephew is red, turn it into case 4
+                    self._set_color(sibling.left, BLACK)
+                    self._set_color(sibling, RED)
+                    self._rotate_right(sibling)
+                    sibling = parent.right
+                # Case 4: red outer nephew
+                self._set_color(sibling, parent.color)
+                self._set_color(parent, BLACK)
+                self._set_color(sibling.right, BLACK)
+                self._rotate_left(parent)
+                x = self.root
+                break
+            else:
+                sibling = parent.left
+                if sibling.color == RED:
+                    self._set_color(sibling, BLACK)
+                    self._set_color(parent, RED)
+                    self._rotate_right(parent)
+                    sibling = parent.left
+                if _color(sibling.left) == BLACK and _color(sibling.right) == BLACK:
+                    self._set_color(sibling, RED)
+                    x = parent
+                    parent = x.parent
+                    continue
+                if _color(sibling.left) == BLACK:
+                    self._set_color(sibling.right, BLACK)
+                    self._set_color(sibling, RED)
+                    self._rotate_left(sibling)
+                    sibling = parent.left
+                self._set_color(sibling, parent.color)
+                self._set_color(parent, BLACK)
+                self._set_color(sibling.left, BLACK)
+                self._rotate_right(parent)
+                x = self.root
+                break
+
+        if x is not None:
+            self._set_color(x, BLACK)
+
+    def apply(self, operation):
+        """Run one ("insert", key[, label]) or ("delete", key) operation and return its steps"""
+        kind = operation[0]
+        if kind == "insert":
+            return self.insert(*operation[1:])
+        if kind == "delete":
+            return self.delete(operation[1])
+        raise ValueError("Unknown operation: %r" % (kind,))
+
+    # Conversion and checks
+
+    def to_tree_data(self):
+        """Return the tree as {heap index: (label, color_char)}, like TreeStructure.tree_data"""
+        tree_data = {}
+        stack = [(self.root, 1)] if self.root is not None else []
+        while stack:
+            node, index = stack.pop()
+            tree_data[index] = (node.label, node.color)
+            if node.left is not None:
+                stack.append((node.left, 2 * index))
+            if node.right is not None:
+                stack.append((node.right, 2 * index + 1))
+        return tree_data
+
+    def to_keys(self):
+        """Return the sort key of every node as {heap index: key}, to go with to_tree_data"""
+        keys = {}
+        stack = [(self.root, 1)] if self.root is not None else []
+        while stack:
+            node, index = stack.pop()
+            keys[index] = node.key
+            if node.left is not None:
+                stack.append((node.left, 2 * index))
+            if node.right is not None:
+                stack.append((node.right, 2 * index + 1))
+        return keys
+
+    @classmethod
+    def from_tree_data(cls, tree_data, key=int, record=True, keys=None):
+        """
+        Build a model from {heap index: (label, color_char)}, e.g. a
+        TreeStructure's tree_data. Sort keys come from keys ({heap index:
+        key}, e.g. from to_keys) when given, otherwise key converts a label
+        to its sort key.
+        """
+        model = cls(record=record)
+        nodes = {}
+        for index in sorted(tree_data):
+            label, color_char = tree_data[index]
+            parent = nodes.get(index // 2)
+            if index != 1 and parent is None:
+                raise ValueError("Node %d has no parent in tree_data" % index)
+            node_key = keys[index] if keys is not None else key(label)
+            node = RBNode(node_key, label, color_char, parent)
+            nodes[index] = node
+            if parent is None:
+                model.root = node
+            elif index % 2 == 0:
+                parent.left = node
+            else:
+                parent.right = node
+        model.size = len(nodes)
+        return model
+
+    def validate(self):
+        """Check the red-black properties and return the black height"""
+        if _color(self.root) != BLACK:
+            raise ValueError("Root is not black")
+
+        black_height = None
+        stack = [(self.root, 0, None, None)]
+        while stack:
+            node, blacks, low, high = stack.pop()
+            if node is None:
+                if black_height is None:
+                    black_height = blacks
+                elif blacks != black_height:
+                    raise ValueError("Paths have different black heights")
+                continue
+            if (low is not None and node.key <= low) or (high is not None and node.key >= high):
+                raise ValueError("Key %r is out of order" % (node.key,))
+            if node.color == RED and (_color(node.left) == RED or _color(node.right) == RED):
+                raise ValueError("Red node %r has a red child" % (node.key,))
+            blacks += node.color == BLACK
+            stack.append((node.left, blacks, low, node.key))
+            stack.append((node.right, blacks, node.key, high))
+        return black_height
@@ -1,51 +1,270 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+import functools
+import json
+import os
+import time
+
 from manim import *
+from manim.animation.animation import prepare_animation
 import numpy as np
 
+# The OperationProfiler currently collecting timings, if any
+_active_profiler = None
+
+def profiled(function):
+    """Time calls to function while an OperationProfiler is active; costs one check otherwise"""
+    name = function.__qualname__
+    
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if _active_profiler is None:
+            return function(*args, **kwargs)
+        return _active_profiler._time_call(name, function, args, kwargs)
+    return wrapper
+
+class OperationProfiler:
+    """
+    Collects per-operation timings for one scene. While active, every
+    @profiled function (TreeStructure methods, the module-level helpers and
+    label rendering) records its call count and cumulative wall time, and the
+    scene's play/add/remove are wrapped to record how many animations each
+    play ran and how many mobjects were added or removed.
+
+        with OperationProfiler(self, report_path="profiles/RotationDemo.json"):
+            left_rotate(self, tree, 1)
+    """
+    def __init__(self, scene, report_path=None, name=None):
+        self.scene = scene
+        self.report_path = report_path
+        self.name = name if name is not None else type(scene).__name__
+        self.functions = {}  # qualified name -> {"calls", "wall_time"}
+        self.plays = []  # (animation count, wall time) per scene.play
+        self.mobjects_added = 0
+        self.mobjects_removed = 0
+        self.wall_time = 0.0
+        self._depths = {}
+        self._start = None
+
+    def __enter__(self):
+        global _active_profiler
+        if _active_profiler is not None:
+            raise RuntimeError("Another OperationProfiler is already active")
+        _active_profiler = self
+        
+        # Instance attributes shadow the scene's methods until __exit__
+        play, add, remove = self.scene.play, self.scene.add, self.scene.remove
+        
+        def timed_play(*animations, **kwargs):
+            start = time.perf_counter()
+            try:
+                return play(*animations, **kwargs)
+            finally:
+                self.plays.append((len(animations), time.perf_counter() - start))
+        
+        def counted_add(*mobjects):
+            self.mobjects_added += len(mobjects)
+            return add(*mobjects)
+        
+        def counted_remove(*mobjects):
+            self.mobjects_removed += len(mobjects)
+            return remove(*mobjects)
+        
+        self.scene.play, self.scene.add, self.scene.remove = timed_play, counted_add, counted_remove
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        global _active_profiler
+        self.wall_time += time.perf_counter() - self._start
+        for name in ("play", "add", "remove"):
+            del self.scene.__dict__[name]
+        _active_profiler = None
+        if self.report_path is not None:
+            self.write_report(self.report_path)
+        return False
+
+    def _time_call(self, name, function, args, kwargs):
+        # Only the outermost call of a recursive function adds to its time
+        depth = self._depths.get(name, 0)
+        self._depths[name] = depth + 1
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            self._depths[name] = depth
+            stats = self.functions.setdefault(name, {"calls": 0, "wall_time": 0.0})
+            stats["calls"] += 1
+            if depth == 0:
+                stats["wall_time"] += time.perf_counter() - start
+
+    def report(self):
+        """Return the collected timings as a JSON-serializable dict"""
+        animation_counts = [count for count, _ in self.plays]
+        return {
+            "scene": self.name,
+            "wall_time": self.wall_time,
+            "functions": dict(sorted(self.functions.items(), key=lambda item: -item[1]["wall_time"])),
+            "plays": {
+                "count": len(self.plays),
+                "wall_time": sum(wall_time for _, wall_time in self.plays),
+                "animations": sum(animation_counts),
+                "max_animations": max(animation_counts, default=0),
+                "per_play": [[count, wall_time] for count, wall_time in self.plays],
+            },
+            "mobjects": {"added": self.mobjects_added, "removed": self.mobjects_removed},
+        }
+
+    def write_report(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+# Rendered label glyphs, keyed by (label, font_size, color). Building a Text
+# goes through Pango and SVG parsing, so each key is only rendered once and
+# callers get a copy. Least recently used entries are dropped past the limit.
+LABEL_CACHE_SIZE = 1024
+_label_cache = OrderedDict()
+
+@profiled
+def make_label(label, font_size, color=WHITE):
+    """Return a Text for label, reusing a cached rendering when there is one"""
+    key = (label, font_size, str(color))
+    text = _label_cache.get(key)
+    if text is None:
+        text = _render_label(label, font_size, color)
+        _label_cache[key] = text
+        if len(_label_cache) > LABEL_CACHE_SIZE:
+            _label_cache.popitem(last=False)
+    else:
+        _label_cache.move_to_end(key)
+    return text.copy()
+
+@profiled
+def _render_label(label, font_size, color):
+    return Text(label, font_size=font_size, color=color)
+
+# Labels are scaled geometrically with their node and only re-rendered once
+# their on-screen size is off from the ideal font size by more than this factor
+LABEL_RERENDER_RATIO = 1.25
+
+# Fill color for each color_char, shared by everything that colors a node.
+# Unknown color chars are drawn white
+NODE_COLORS = {"B": BLACK, "R": RED, "O": ORANGE, "W": WHITE, "b": BLUE, "G": GREEN}
+
 class TreeNode(VGroup):
+    @profiled
     def __init__(self, label, color_char="B", radius=0.3, **kwargs):
         super().__init__(**kwargs)
-        color_map = {"B": BLACK, "R": RED, "O": ORANGE, "W": WHITE, "b": BLUE, "G": GREEN}
-        fill_color = color_map.get(color_char, WHITE)
+        fill_color = NODE_COLORS.get(color_char, WHITE)
 
         self.radius = radius
         self.circle = Circle(radius=self.radius, color=WHITE, stroke_width=3).set_fill(fill_color, opacity=1)
+        self.body = self.circle  # Edges attach to the top and bottom of the body
         # Font size scales with radius
-        font_size = max(12, int(24 * radius / 0.3))
-        self.text = Text(label, font_size=font_size).move_to(self.circle.get_center())
+        self.font_size = max(12, int(24 * radius / 0.3))
+        self._text_scale = 1.0  # Geometric scaling applied since the text was rendered
+        self.text = make_label(label, self.font_size).move_to(self.circle.get_center())
 
         self.add(self.circle, self.text)
         self.label = label
         self.color_char = color_char
 
     def set_node_color(self, color_char):
-        color_map = {"B": BLACK, "R": RED, "O": ORANGE, "W": WHITE, "b": BLUE, "G": GREEN}
-        self.circle.set_fill(color_map.get(color_char, WHITE), opacity=1)
+        self.circle.set_fill(NODE_COLORS.get(color_char, WHITE), opacity=1)
         self.color_char = color_char
 
+    @profiled
     def update_label(self, new_label):
         """Update the label and recreate the text object"""
         self.remove(self.text)
         # Font size scales with radius
-        font_size = max(12, int(24 * self.radius / 0.3))
-        self.text = Text(new_label, font_size=font_size).move_to(self.circle.get_center())
+        self.font_size = max(12, int(24 * self.radius / 0.3))
+        self._text_scale = 1.0
+        self.text = make_label(new_label, self.font_size).move_to(self.circle.get_center())
         self.add(self.text)
         self.label = new_label
 
+    @profiled
     def scale_node(self, scale_factor):
-        """Scale the node by a given factor"""
+        """Scale the node by a given factor, transforming the circle and text in place"""
         self.radius *= scale_factor
-        new_circle = Circle(radius=self.radius, color=WHITE, stroke_width=3)
-        new_circle.set_fill(self.circle.fill_color, opacity=1)
-        new_circle.move_to(self.circle.get_center())
+        center = self.circle.get_center()
+        self.circle.scale(scale_factor)
         
-        # Update font size based on new radius
+        # The glyphs are vectors, so scaling them is enough unless the
+        # minimum font size kicks in and the text would become illegible
         font_size = max(12, int(24 * self.radius / 0.3))
-        new_text = Text(self.label, font_size=font_size).move_to(self.circle.get_center())
-        
-        self.remove(self.circle, self.text)
-        self.circle = new_circle
-        self.text = new_text
-        self.add(self.circle, self.text)
+        shown_size = self.font_size * self._text_scale * scale_factor
+        if 1 / LABEL_RERENDER_RATIO <= shown_size / font_size <= LABEL_RERENDER_RATIO:
+            self.text.scale(scale_factor).move_to(center)
+            self._text_scale *= scale_factor
+        else:
+            self.update_label(self.label)
+
+class SubtreeSummary(VGroup):
+    """
+    Stand-in for a collapsed subtree in level-of-detail mode: a triangle
+    labelled with the subtree's node count and black-height. The nodes it
+    hides are kept in subtree_data, indexed relative to the subtree root (1).
+    """
+    @profiled
+    def __init__(self, subtree_data, radius=0.3, **kwargs):
+        super().__init__(**kwargs)
+        self.subtree_data = subtree_data
+        self.radius = radius
+        self.label, self.color_char = subtree_data[1]
+        self.count = len(subtree_data)
+
+        # Black nodes from the subtree root down to a leaf, any path will do
+        self.black_height = 0
+        index = 1
+        while index in subtree_data:
+            self.black_height += subtree_data[index][1] == "B"
+            index *= 2
+
+        self.shape = Triangle(color=GREY_B, stroke_width=3).set_fill(GREY_D, opacity=1).scale(1.3 * radius)
+        self.body = self.shape
+        self.font_size = max(8, int(14 * radius / 0.3))
+        self.text = make_label("%d\nbh %d" % (self.count, self.black_height), self.font_size)
+        if self.text.width > 0.8 * self.shape.width:
+            self.text.scale_to_fit_width(0.8 * self.shape.width)
+        self.text.move_to(self.shape.get_center() + DOWN * 0.15 * self.shape.height)
+        self.add(self.shape, self.text)
+
+    def tree_data_at(self, root_index):
+        """The hidden nodes as {absolute heap index: (label, color_char)} for a subtree rooted at root_index"""
+        tree_data = {}
+        for relative, item in self.subtree_data.items():
+            depth = relative.bit_length() - 1
+            tree_data[(root_index << depth) | (relative ^ (1 << depth))] = item
+        return tree_data
+
+    def scale_node(self, scale_factor):
+        self.radius *= scale_factor
+        self.scale(scale_factor)
+
+def segment_points(starts, ends):
+    """
+    Bezier points of straight segments from each row of starts to the same
+    row of ends, shaped (N, 4, 3): one cubic curve per segment with its
+    handles a third of the way along, the same points a Line uses
+    """
+    steps = np.array([0, 1 / 3, 2 / 3, 1])[None, :, None]
+    return starts[:, None, :] + (ends - starts)[:, None, :] * steps
+
+class EdgeMesh(VMobject):
+    """All edges of a tree drawn as the straight segments of a single VMobject"""
+    def __init__(self, color=WHITE, **kwargs):
+        super().__init__(color=color, **kwargs)
+
+    def set_segments(self, starts, ends):
+        """Redraw as one straight segment from each row of starts to the same row of ends"""
+        if len(starts) == 0:
+            return self.set_points(np.zeros((0, 3)))
+        return self.set_points(segment_points(starts, ends).reshape(-1, 3))
 
 class TreeArrow:
     def __init__(self, scene, tree_structure, color=YELLOW):
@@ -58,6 +277,7 @@ class TreeArrow:
     def create_arrow(self, index):
         if index in self.tree_structure.nodes:
             node = self.tree_structure.nodes[index]
+            self.tree_structure._sync(node)
             start = node.get_top() + UP * 1.2
             end = node.get_top() + UP * 0.1
             self.arrow = Arrow(start=start, end=end, color=self.color, buff=0, stroke_width=6)
@@ -68,55 +288,333 @@ class TreeArrow:
     def move_to(self, new_index):
         if new_index in self.tree_structure.nodes and self.arrow:
             node = self.tree_structure.nodes[new_index]
+            self.tree_structure._sync(node)
             new_start = node.get_top() + UP * 1.2
             new_end = node.get_top() + UP * 0.1
             new_arrow = Arrow(start=new_start, end=new_end, color=self.color, buff=0, stroke_width=6)
             self.scene.play(Transform(self.arrow, new_arrow), run_time=0.3)
             self.current_index = new_index
 
+    def follow_path(self, indices, total_time=2.0):
+        """
+        Move the arrow through a path of node indices (e.g. a search from the
+        root down) as one continuous animation, creating it at the first
+        index if there is no arrow yet.
+        """
+        indices = [index for index in indices if index in self.tree_structure.nodes]
+        if not indices:
+            return
+        if self.arrow is None:
+            self.create_arrow(indices[0])
+        if indices[0] == self.current_index:
+            indices = indices[1:]
+        if not indices:
+            return
+        
+        # The arrow keeps its shape, so moving its center through the points
+        # create_arrow would aim it from is enough
+        nodes = [self.tree_structure.nodes[index] for index in indices]
+        self.tree_structure._sync(self.arrow, *nodes)
+        points = [self.arrow.get_center()] + [node.get_top() + UP * 0.65 for node in nodes]
+        path = VMobject().set_points_as_corners(points)
+        self.scene.play(MoveAlongPath(self.arrow, path), run_time=total_time, rate_func=linear)
+        self.current_index = indices[-1]
+
+    def follow_search(self, target, total_time=2.0, key=int):
+        """Follow the path a search for target takes (see search_path) and return it"""
+        path = search_path(self.tree_structure, target, key)
+        self.follow_path(path, total_time)
+        return path
+
     def remove(self):
         if self.arrow:
             self.scene.play(FadeOut(self.arrow), run_time=0.2)
             self.arrow = None
             self.current_index = None
 
+def _check_lod_min_pixels(min_pixels):
+    # Halving the spacing never gets below a limit of zero or less
+    if min_pixels is not None and min_pixels <= 0:
+        raise ValueError("lod_min_pixels must be positive, got %r" % (min_pixels,))
+
 class TreeStructure:
-    def __init__(self, scene, radius=0.3, h_spacing=5.0, v_spacing=1.2, root_pos=None):
+    def __init__(self, scene, radius=0.3, h_spacing=5.0, v_spacing=1.2, root_pos=None,
+                 lod_depth=None, lod_min_pixels=None, batched_edges=False):
         self.scene = scene
         self.nodes = {}  # index -> TreeNode
         self.edges = {}  # (parent_index, child_index) -> Line
         self.tree_data = {}  # index -> (label, color)
         self.positions = {}  # index -> position
         
+        # Reverse indexes so lookups don't scan the dicts above
+        self._node_indices = {}  # id(TreeNode) -> index
+        self._incident_edges = {}  # index -> set of edge keys touching it
+
         # Tree layout parameters - now configurable
         self.radius = radius
         self.root_pos = root_pos if root_pos is not None else (ORIGIN + 2.3 * UP)
         self.level_height = v_spacing
         self.base_h_spacing = h_spacing
+        
+        # Cached index -> position table, valid for one set of layout parameters
+        self._layout_params = None
+        self._layout_cache = {}
+
+        # Level of detail: subtrees from this depth down (or where children
+        # would be closer than lod_min_pixels) are drawn as a SubtreeSummary
+        _check_lod_min_pixels(lod_min_pixels)
+        self.lod_depth = lod_depth
+        self.lod_min_pixels = lod_min_pixels
+
+        # With batched_edges every edge is drawn as a segment of one EdgeMesh;
+        # self.edges then only records the edge keys, each mapped to None
+        self.batched_edges = batched_edges
+        self.edge_mesh = EdgeMesh() if batched_edges else None
+        self._edge_mesh_shown = False
+
+        # Highlight rings taken off screen, reused by highlight_nodes
+        self._ring_pool = []
+        self._ring_ids = set()  # id() of every ring the pool handed out
+
+    @contextmanager
+    def recording(self):
+        """
+        Record every animation on this tree into an AnimationPlan and play
+        the compiled plan when the block exits. Pass the yielded plan as the
+        scene argument of the module-level helpers:
+
+            with tree.recording() as plan:
+                left_rotate(plan, tree, 1)
+        """
+        plan = AnimationPlan(self.scene)
+        self.scene = plan
+        try:
+            yield plan
+        finally:
+            self.scene = plan.scene
+            plan.flush()
+
+    def _sync(self, *mobjects):
+        """While recording, play out pending animations on these mobjects before they are read or changed"""
+        if isinstance(self.scene, AnimationPlan):
+            self.scene.sync(*mobjects)
 
     def find_node_index(self, target_node):
-        for index, node in self.nodes.items():
-            if node is target_node:  # Using 'is' for object identity
-                return index
-        return None  # Node not found
-    
+        # Keyed on id() for object identity
+        return self._node_indices.get(id(target_node))  # None if not found
+
+    def _replace_nodes(self, new_node_map, new_data_map):
+        """Install a whole new index -> node mapping and rebuild the reverse index"""
+        self.nodes = new_node_map
+        self.tree_data = new_data_map
+        self._node_indices = {id(node): index for index, node in new_node_map.items()}
+
+    def _store_edge(self, edge_key, edge):
+        self.edges[edge_key] = edge
+        for index in edge_key:
+            self._incident_edges.setdefault(index, set()).add(edge_key)
+
+    def _pop_edge(self, edge_key):
+        """Forget an edge and return its Line"""
+        for index in edge_key:
+            incident = self._incident_edges.get(index)
+            if incident is not None:
+                incident.discard(edge_key)
+                if not incident:
+                    del self._incident_edges[index]
+        return self.edges.pop(edge_key)
+
+    def _new_edge(self, parent_index, child_index):
+        """Create and store the edge between two drawn nodes (just its key, returning None, with batched edges)"""
+        if self.batched_edges:
+            self._store_edge((parent_index, child_index), None)
+            return None
+        parent_node = self.nodes[parent_index]
+        child_node = self.nodes[child_index]
+        self._sync(parent_node, child_node)
+        edge = Line(parent_node.get_bottom(), child_node.get_top(), color=WHITE)
+        self._store_edge((parent_index, child_index), edge)
+        return edge
+
+    def _show_edges(self, edges, animate=False, run_time=0.5):
+        """Put stored edges on screen, with Create unless they are batched into the mesh"""
+        if self.batched_edges:
+            self.refresh_edge_mesh()
+        elif edges and animate:
+            self.scene.play(*[Create(edge) for edge in edges], run_time=run_time)
+        elif edges:
+            self.scene.add(*edges)
+
+    def _hide_edges(self, edges, animate=False, run_time=0.3):
+        """Take popped edges off screen, with FadeOut unless they are batched into the mesh"""
+        if self.batched_edges:
+            self.refresh_edge_mesh()
+        elif edges and animate:
+            self.scene.play(*[FadeOut(edge) for edge in edges], run_time=run_time)
+        elif edges:
+            self.scene.remove(*edges)
+
+    def _edge_rows(self, edge_keys):
+        """The nodes at the ends of these edges, plus each edge's parent and child row in that list"""
+        rows = {}
+        for edge_key in edge_keys:
+            for index in edge_key:
+                rows.setdefault(index, len(rows))
+        nodes = [self.nodes[index] for index in rows]
+        parents = np.array([rows[parent_index] for parent_index, _ in edge_keys], dtype=int)
+        children = np.array([rows[child_index] for _, child_index in edge_keys], dtype=int)
+        return nodes, parents, children
+
+    @staticmethod
+    def _edge_endpoints(nodes, parents, children):
+        """
+        Current start (parent bottom) and end (child top) of each edge as two
+        arrays, computed from one array of node body centers and half heights
+        """
+        if not nodes:
+            return np.zeros((0, 3)), np.zeros((0, 3))
+        bodies = [node.body.points for node in nodes]
+        low = np.array([points.min(axis=0) for points in bodies])
+        high = np.array([points.max(axis=0) for points in bodies])
+        centers = (low + high) / 2
+        half_heights = np.zeros_like(centers)
+        half_heights[:, 1] = (high[:, 1] - low[:, 1]) / 2
+        return centers[parents] - half_heights[parents], centers[children] + half_heights[children]
+
+    def _update_edge_mesh(self):
+        self.edge_mesh.set_segments(*self._edge_endpoints(*self._edge_rows(list(self.edges))))
+
+    @profiled
+    def refresh_edge_mesh(self):
+        """Redraw the batched edge mesh from the current edges and node positions"""
+        if not self.batched_edges:
+            return
+        self._sync(self.edge_mesh)
+        self._update_edge_mesh()
+        if not self._edge_mesh_shown:
+            self.scene.add(self.edge_mesh)
+            self._edge_mesh_shown = True
+
+    @profiled
+    def edge_follow_animations(self, indices=None):
+        """
+        Animations that keep every edge (or only the edges touching indices)
+        attached to its nodes while the nodes are animated; play them together
+        with the node animations. A single updater serves all of them: each
+        frame it reads the node centers into one array and moves every edge
+        endpoint from it.
+        """
+        # Bound to the current edges, which may be rebuilt before a recorded play runs
+        if indices is None:
+            edge_keys = list(self.edges)
+        else:
+            edge_keys = sorted({edge_key for index in indices for edge_key in self._incident_edges.get(index, ())})
+        edge_keys = [edge_key for edge_key in edge_keys if edge_key[0] in self.nodes and edge_key[1] in self.nodes]
+        if not edge_keys:
+            return []
+        rows = self._edge_rows(edge_keys)
+        
+        if self.batched_edges:
+            return [self._mesh_follow_animation(edge_keys, rows)]
+        
+        edges = [self.edges[edge_key] for edge_key in edge_keys]
+        last_alpha = [None]
+        
+        def update_edges(mob, alpha):
+            if alpha != last_alpha[0]:
+                last_alpha[0] = alpha
+                for edge, points in zip(edges, segment_points(*self._edge_endpoints(*rows))):
+                    edge.set_points(points)
+            return mob
+        
+        # Every edge keeps its own handle so the renderer treats it as moving,
+        # but the first handle called in a frame moves all edges at once
+        return [UpdateFromAlphaFunc(edge, update_edges) for edge in edges]
+
+    def _mesh_follow_animation(self, edge_keys, rows):
+        """
+        The edge mesh updater for edge_follow_animations. The mesh always
+        holds every edge: the ones outside edge_keys are read once when the
+        play starts and only the rows of edge_keys are recomputed per frame.
+        """
+        all_keys = [edge_key for edge_key in self.edges if edge_key[0] in self.nodes and edge_key[1] in self.nodes]
+        all_rows = self._edge_rows(all_keys)
+        mesh_rows = {edge_key: row for row, edge_key in enumerate(all_keys)}
+        moving = np.array([mesh_rows[edge_key] for edge_key in edge_keys], dtype=int)
+        segments = []
+        
+        def update_mesh(mob, alpha):
+            if not segments:
+                segments.extend(self._edge_endpoints(*all_rows))
+            starts, ends = segments
+            starts[moving], ends[moving] = self._edge_endpoints(*rows)
+            return mob.set_segments(starts, ends)
+        
+        return UpdateFromAlphaFunc(self.edge_mesh, update_mesh)
+
+    def edge_line(self, parent_index, child_index, **kwargs):
+        """A standalone Line over one edge at its current position, e.g. for highlighting"""
+        start, end = self._edge_endpoints(*self._edge_rows([(parent_index, child_index)]))
+        return Line(start[0], end[0], **kwargs)
+
+    @profiled
+    def highlight_edge(self, parent_index, child_index, color=YELLOW, duration=0.5):
+        """Draw a colored line over an edge; remove it with remove_highlight"""
+        if (parent_index, child_index) not in self.edges:
+            return None
+        
+        self._sync(self.nodes[parent_index], self.nodes[child_index])
+        highlight_line = self.edge_line(parent_index, child_index, color=color, stroke_width=8)
+        self.scene.play(Create(highlight_line), run_time=duration)
+        return highlight_line
+
+    @profiled
     def calculate_position(self, index, level=0):
         """Calculate the fixed position for a node based on its index"""
-        if index == 1:  # Root
-            return self.root_pos
-        
-        # For binary heap indexing: parent = index // 2
-        parent_index = index // 2
-        parent_pos = self.calculate_position(parent_index, level - 1)
+        return self._layout_table((index,))[index]
+
+    @profiled
+    def _layout_table(self, indices=()):
+        """
+        Return the cached index -> position table for the current layout.
+        The table is keyed on (root_pos, level_height, base_h_spacing) and is
+        rebuilt for every occupied index in one batched pass when those change.
+        Any requested indices that are still missing are filled in together.
+        """
+        params = (tuple(self.root_pos), self.level_height, self.base_h_spacing)
+        if params != self._layout_params:
+            self._layout_params = params
+            self._layout_cache = {}
+            indices = list(self.tree_data) + list(indices)
         
-        # Calculate horizontal offset based on level
-        h_spacing = self.base_h_spacing / (2 ** level)
+        missing = [index for index in indices if index not in self._layout_cache]
+        if missing:
+            self._layout_cache.update(zip(missing, self._compute_positions(missing)))
+        return self._layout_cache
+
+    def _compute_positions(self, indices):
+        """
+        Vectorized layout for a batch of indices. A node at depth d with
+        index i sits at x = root_x + base_h_spacing * ((2i + 1) / 2^d - 3),
+        which is the closed form of halving the spacing at every level.
+        """
+        if max(indices).bit_length() <= 53:
+            # Exactly representable as float64, so do everything in NumPy
+            idx = np.array(indices, dtype=np.float64)
+            depth = np.frexp(idx)[1] - 1
+            offset = (2 * idx + 1) / np.exp2(depth) - 3
+        else:
+            # Deep indices overflow int64; Python ints divide exactly
+            depth = np.array([index.bit_length() - 1 for index in indices], dtype=np.float64)
+            offset = np.array([(2 * index + 1) / (1 << (index.bit_length() - 1)) - 3 for index in indices])
         
-        if index % 2 == 0:  # Left child
-            return parent_pos + DOWN * self.level_height + LEFT * h_spacing
-        else:  # Right child
-            return parent_pos + DOWN * self.level_height + RIGHT * h_spacing
+        positions = np.empty((len(indices), 3))
+        positions[:, 0] = self.root_pos[0] + self.base_h_spacing * offset
+        positions[:, 1] = self.root_pos[1] - self.level_height * depth
+        positions[:, 2] = self.root_pos[2]
+        return positions
 
+    @profiled
     def add_node(self, index, label, color_char="B", animate=True):
         """Add a node at the specified index"""
         if index in self.nodes:
@@ -128,47 +626,292 @@ class TreeStructure:
         self.nodes[index] = node
         self.tree_data[index] = (label, color_char)
         self.positions[index] = position
-        
+        self._node_indices[id(node)] = index
+
         if animate:
             self.scene.add(node)
             self.scene.play(FadeIn(node), run_time=0.3)
         else:
             self.scene.add(node)
 
-    def add_edge(self, parent_index, child_index, animate=True):
-        """Add an edge between parent and child"""
-        if parent_index not in self.nodes or child_index not in self.nodes:
+    @profiled
+    def add_nodes(self, nodes_data, animate=True, lag_ratio=0, run_time=1.0):
+        """
+        Add many nodes at once, together with every edge they complete.
+        nodes_data is an iterable of (index, label, color_char) tuples.
+        All nodes and edges are created up front and animated in a single
+        scene.play call, staggered with LaggedStart when lag_ratio > 0.
+        """
+        nodes_data = [item for item in nodes_data if item[0] not in self.nodes]
+        if not nodes_data:
             return
         
-        parent_node = self.nodes[parent_index]
-        child_node = self.nodes[child_index]
+        # Edges to existing neighbours are laid out from their current geometry
+        self._sync(*[self.nodes[neighbour] for index, _, _ in nodes_data
+                     for neighbour in (index // 2, 2 * index, 2 * index + 1) if neighbour in self.nodes])
         
-        edge = Line(parent_node.get_bottom(), child_node.get_top(), color=WHITE)
-        self.edges[(parent_index, child_index)] = edge
+        layout = self._layout_table([index for index, _, _ in nodes_data])
+        for index, label, color_char in nodes_data:
+            node = TreeNode(label, color_char, radius=self.radius).move_to(layout[index])
+            self.nodes[index] = node
+            self.tree_data[index] = (label, color_char)
+            self.positions[index] = layout[index]
+            self._node_indices[id(node)] = index
+
+        # Create nodes and edges in level order so a staggered build grows
+        # downwards, each node appearing together with the edge above it
+        new_mobjects = []
+        animations = []
+        for index in sorted(index for index, _, _ in nodes_data):
+            node = self.nodes[index]
+            new_mobjects.append(node)
+            animations.append(FadeIn(node))
+            
+            for parent_index, child_index in ((index // 2, index), (index, 2 * index), (index, 2 * index + 1)):
+                if (parent_index, child_index) in self.edges:
+                    continue
+                if parent_index not in self.nodes or child_index not in self.nodes:
+                    continue
+                edge = self._new_edge(parent_index, child_index)
+                if not self.batched_edges:
+                    new_mobjects.append(edge)
+                    animations.append(Create(edge))
         
+        # Batched edges appear with the mesh, ahead of the nodes fading in
+        self.refresh_edge_mesh()
         if animate:
-            self.scene.add(edge)
-            self.scene.play(Create(edge), run_time=0.2)
+            if lag_ratio > 0:
+                self.scene.play(LaggedStart(*animations, lag_ratio=lag_ratio), run_time=run_time)
+            else:
+                self.scene.play(*animations, run_time=run_time)
         else:
-            self.scene.add(edge)
+            self.scene.add(*new_mobjects)
 
+    @profiled
+    def restore(self, tree_data):
+        """
+        Replace the whole tree with tree_data ({index: (label, color_char)})
+        without animating: nodes and edges are added to the scene directly.
+        """
+        self._sync(*self.nodes.values())
+        self.scene.remove(*self.nodes.values(), *[edge for edge in self.edges.values() if edge is not None])
+        self._replace_nodes({}, {})
+        self.positions = {}
+        self.edges = {}
+        self._incident_edges = {}
+        self._place_data(tree_data, self._lod_cutoff())
+        self.refresh_edge_mesh()
+
+    def export_state(self):
+        """
+        Return the tree as a JSON-friendly dict: layout parameters, root
+        position and one [index, label, color_char] entry per node.
+        """
+        return {
+            "radius": self.radius,
+            "h_spacing": self.base_h_spacing,
+            "v_spacing": self.level_height,
+            "root_pos": [float(value) for value in self.root_pos],
+            "nodes": [[index, label, color_char] for index, (label, color_char) in sorted(self.full_tree_data().items())],
+        }
+
+    @profiled
+    def restore_state(self, state):
+        """Restore a dict from export_state without animating"""
+        self.radius = state["radius"]
+        self.base_h_spacing = state["h_spacing"]
+        self.level_height = state["v_spacing"]
+        self.root_pos = np.array(state["root_pos"], dtype=float)
+        self.restore({index: (label, color_char) for index, label, color_char in state["nodes"]})
+
+    def save_state(self, path):
+        """Write export_state() to a compact JSON file"""
+        with open(path, "w") as f:
+            json.dump(self.export_state(), f, separators=(",", ":"))
+
+    def load_state(self, path):
+        """Restore a file written by save_state without animating"""
+        with open(path) as f:
+            self.restore_state(json.load(f))
+
+    @property
+    def lod_enabled(self):
+        return self.lod_depth is not None or self.lod_min_pixels is not None
+
+    def set_lod(self, depth=None, min_pixels=None):
+        """Change the level-of-detail limits (both None turns it off) and redraw accordingly"""
+        _check_lod_min_pixels(min_pixels)
+        self.lod_depth = depth
+        self.lod_min_pixels = min_pixels
+        self.refresh_lod()
+
+    def _lod_cutoff(self):
+        """Depth at which subtrees are collapsed, or None when level of detail is off"""
+        cutoffs = []
+        if self.lod_depth is not None:
+            cutoffs.append(self.lod_depth)
+        if self.lod_min_pixels is not None:
+            # The children of a node at depth d sit base_h_spacing / 2^d apart
+            pixels = self.base_h_spacing * config.pixel_width / config.frame_width
+            depth = 0
+            while pixels >= self.lod_min_pixels:
+                pixels /= 2
+                depth += 1
+            cutoffs.append(depth)
+        return min(cutoffs) if cutoffs else None
+
+    def full_tree_data(self):
+        """tree_data including the nodes hidden inside collapsed subtrees"""
+        tree_data = dict(self.tree_data)
+        for index, node in self.nodes.items():
+            if isinstance(node, SubtreeSummary):
+                tree_data.update(node.tree_data_at(index))
+        return tree_data
+
+    @profiled
+    def refresh_lod(self):
+        """
+        Reconcile the drawing with the level-of-detail limits: collapsed
+        subtrees that an operation moved above the cutoff are opened up, and
+        subtrees at the cutoff are collapsed again, including ones touch()
+        expanded. Nothing is animated.
+        """
+        cutoff = self._lod_cutoff()
+        self._sync(*self.nodes.values())
+        
+        above = [index for index, node in self.nodes.items()
+                 if isinstance(node, SubtreeSummary) and (cutoff is None or self._get_level(index) < cutoff)]
+        for index in above:
+            self._expand(index, cutoff)
+        if cutoff is None:
+            return
+        
+        at_cutoff = [index for index, node in self.nodes.items()
+                     if self._get_level(index) == cutoff and not isinstance(node, SubtreeSummary)
+                     and (2 * index in self.nodes or 2 * index + 1 in self.nodes)]
+        for index in at_cutoff:
+            self._collapse(index)
+
+    @profiled
+    def touch(self, *indices):
+        """
+        Open up any collapsed subtrees on the way to these indices, so the
+        nodes and their children are drawn individually. Operations call this
+        before reading the nodes they work on.
+        """
+        if not self.lod_enabled:
+            return
+        for index in indices:
+            depth = self._get_level(index)
+            for level in range(depth + 1):
+                ancestor = index >> (depth - level)
+                node = self.nodes.get(ancestor)
+                if node is None:
+                    break
+                if isinstance(node, SubtreeSummary):
+                    self._expand(ancestor, level + 1)
+
+    def _place_data(self, tree_data, cutoff):
+        """
+        Draw tree_data without animating: nodes above the cutoff depth (or all
+        of them when cutoff is None) individually, deeper subtrees as summaries
+        """
+        nodes_data = []
+        subtrees = {}
+        for index, (label, color_char) in tree_data.items():
+            depth = self._get_level(index)
+            if cutoff is None or depth < cutoff:
+                nodes_data.append((index, label, color_char))
+            else:
+                subtrees.setdefault(index >> (depth - cutoff), {})[index] = (label, color_char)
+        
+        for root_index, subtree_data in subtrees.items():
+            if len(subtree_data) == 1:
+                nodes_data.append((root_index,) + subtree_data[root_index])
+            else:
+                self._add_summary(root_index, subtree_data)
+        self.add_nodes(nodes_data, animate=False)
+
+    def _add_summary(self, root_index, tree_data):
+        """Draw the subtree in tree_data ({absolute index: item}) as one SubtreeSummary"""
+        depth = self._get_level(root_index)
+        subtree_data = {}
+        for index, item in tree_data.items():
+            below = self._get_level(index) - depth
+            subtree_data[(1 << below) | (index ^ (root_index << below))] = item
+        
+        position = self._layout_table((root_index,))[root_index]
+        summary = SubtreeSummary(subtree_data, radius=self.radius).move_to(position)
+        self.nodes[root_index] = summary
+        self.tree_data[root_index] = subtree_data[1]
+        self.positions[root_index] = position
+        self._node_indices[id(summary)] = root_index
+        self.scene.add(summary)
+        
+        if root_index > 1 and root_index // 2 in self.nodes:
+            self._show_edges([self._new_edge(root_index // 2, root_index)])
+
+    def _drop_mobjects(self, indices):
+        """Take nodes (and their edges) off the scene and out of the index maps, keeping nothing"""
+        mobjects = []
+        for index in indices:
+            node = self.nodes.pop(index)
+            del self.tree_data[index]
+            self.positions.pop(index, None)
+            del self._node_indices[id(node)]
+            mobjects.append(node)
+            for edge_key in list(self._incident_edges.get(index, ())):
+                edge = self._pop_edge(edge_key)
+                if edge is not None:
+                    mobjects.append(edge)
+        self._sync(*mobjects)
+        self.scene.remove(*mobjects)
+        self.refresh_edge_mesh()
+
+    def _collapse(self, root_index):
+        """Replace the drawn subtree at root_index with a SubtreeSummary"""
+        tree_data = {}
+        subtree = collect_subtree_nodes(self, root_index)
+        for index in subtree:
+            node = self.nodes[index]
+            if isinstance(node, SubtreeSummary):
+                tree_data.update(node.tree_data_at(index))
+            else:
+                tree_data[index] = self.tree_data[index]
+        self._drop_mobjects(subtree)
+        self._add_summary(root_index, tree_data)
+
+    def _expand(self, root_index, cutoff):
+        """Redraw the SubtreeSummary at root_index down to the cutoff depth"""
+        tree_data = self.nodes[root_index].tree_data_at(root_index)
+        self._drop_mobjects([root_index])
+        self._place_data(tree_data, cutoff)
+
+    @profiled
+    def add_edge(self, parent_index, child_index, animate=True):
+        """Add an edge between parent and child"""
+        if parent_index not in self.nodes or child_index not in self.nodes:
+            return
+        
+        edge = self._new_edge(parent_index, child_index)
+        self._show_edges([edge], animate, run_time=0.2)
+
+    @profiled
     def remove_node(self, index, animate=True):
         """Remove a node and its connected edges"""
+        self.touch(index)
         if index not in self.nodes:
             return
         
         node = self.nodes[index]
         
         # Find all edges connected to this node
-        connected_edges = []
-        edges_to_remove = []
-        
-        for (parent, child), edge in self.edges.items():
-            if parent == index or child == index:
-                connected_edges.append(edge)
-                edges_to_remove.append((parent, child))
-        
+        edges_to_remove = list(self._incident_edges.get(index, ()))
+        connected_edges = [self.edges[edge_key] for edge_key in edges_to_remove]
+
         # Remove from scene
+        if self.batched_edges:
+            connected_edges = []  # Dropped from the mesh below
         if animate:
             fade_objects = [node] + connected_edges
             self.scene.play(*[FadeOut(obj) for obj in fade_objects], run_time=0.5)
@@ -179,17 +922,22 @@ class TreeStructure:
         del self.nodes[index]
         del self.tree_data[index]
         del self.positions[index]
+        del self._node_indices[id(node)]
         
         for edge_key in edges_to_remove:
-            del self.edges[edge_key]
+            self._pop_edge(edge_key)
+        self.refresh_edge_mesh()
 
+    @profiled
     def swap_nodes(self, index1, index2, animate=True):
         """Swap two nodes by exchanging their data and positions"""
+        self.touch(index1, index2)
         if index1 not in self.nodes or index2 not in self.nodes:
             return
         
         node1 = self.nodes[index1]
         node2 = self.nodes[index2]
+        self._sync(node1, node2)
         
         # Get positions
         pos1 = self.positions[index1]
@@ -213,17 +961,22 @@ class TreeStructure:
         # Swap the nodes in our data structure
         self.nodes[index1] = node2
         self.nodes[index2] = node1
-        
+        self._node_indices[id(node2)] = index1
+        self._node_indices[id(node1)] = index2
+
         # Update the tree data
         self.tree_data[index1] = (label2, color_char2)
         self.tree_data[index2] = (label1, color_char1)
 
+    @profiled
     def update_node_data(self, index, new_label=None, new_color_char=None):
         """Update node's label and/or color"""
+        self.touch(index)
         if index not in self.nodes:
             return
         
         node = self.nodes[index]
+        self._sync(node)
         
         if new_label is not None:
             node.update_label(new_label)
@@ -235,57 +988,206 @@ class TreeStructure:
             label, color_char = self.tree_data[index]
             self.tree_data[index] = (label, new_color_char)
 
+    @profiled
+    def recolor(self, colors, animate=True, run_time=0.4):
+        """
+        Set the colors of many nodes at once from {index: color_char}. The
+        tree data is updated right away and all fills change together in a
+        single animation, or instantly with animate=False (e.g. while setting
+        up a large tree). Indices without a node are skipped.
+        """
+        self.touch(*colors)
+        changes = [(self.nodes[index], index, color_char)
+                   for index, color_char in colors.items() if index in self.nodes]
+        if not changes:
+            return
+        
+        self._sync(*[node for node, _, _ in changes])
+        animations = []
+        for node, index, color_char in changes:
+            label, _ = self.tree_data[index]
+            self.tree_data[index] = (label, color_char)
+            if animate:
+                animations.append(node.circle.animate.set_fill(NODE_COLORS.get(color_char, WHITE), opacity=1))
+                node.color_char = color_char
+            else:
+                node.set_node_color(color_char)
+        
+        if animations:
+            self.scene.play(*animations, run_time=run_time)
+
+    @profiled
     def rebuild_edges(self):
-        """Rebuild all edges based on current node positions"""
-        # Remove all existing edges
-        for edge in self.edges.values():
-            self.scene.remove(edge)
-        self.edges.clear()
-        
-        # Rebuild edges based on heap structure
-        for index in sorted(self.nodes.keys()):
-            left_child = 2 * index
-            right_child = 2 * index + 1
+        """
+        Bring the edges in line with the current structure and node positions.
+        Edges that still exist keep their Line and only get new endpoints if
+        their nodes moved; only edges that appeared or disappeared are created
+        or removed. Returns the list of newly created edges (always empty with
+        batched edges, where everything is redrawn as part of the mesh).
+        """
+        self._sync(*self.nodes.values())
+        
+        # Edges required by the heap structure
+        wanted = set()
+        for index in self.nodes:
+            if index > 1 and index // 2 in self.nodes:
+                wanted.add((index // 2, index))
+        
+        # Remove edges that no longer exist
+        stale = [edge_key for edge_key in self.edges if edge_key not in wanted]
+        if self.batched_edges:
+            for edge_key in stale:
+                self._pop_edge(edge_key)
+            for parent_index, child_index in wanted - set(self.edges):
+                self._new_edge(parent_index, child_index)
+            self.refresh_edge_mesh()
+            return []
+        
+        if stale:
+            self.scene.remove(*[self._pop_edge(edge_key) for edge_key in stale])
+        
+        # Update moved edges in place and create the missing ones
+        new_edges = []
+        for parent_index, child_index in wanted:
+            start = self.nodes[parent_index].get_bottom()
+            end = self.nodes[child_index].get_top()
+            edge = self.edges.get((parent_index, child_index))
             
-            if left_child in self.nodes:
-                self.add_edge(index, left_child, animate=False)
-            if right_child in self.nodes:
-                self.add_edge(index, right_child, animate=False)
+            if edge is None:
+                edge = Line(start, end, color=WHITE)
+                self._store_edge((parent_index, child_index), edge)
+                new_edges.append(edge)
+            elif not (np.allclose(edge.get_start(), start) and np.allclose(edge.get_end(), end)):
+                edge.put_start_and_end_on(start, end)
+        
+        if new_edges:
+            self.scene.add(*new_edges)
+        return new_edges
+
+    @profiled
+    def remap_nodes(self, index_map):
+        """
+        Move nodes to new indices in place. index_map is {old index: new index}
+        and covers every node of the subtree being rearranged, so only those
+        nodes and the edges touching them are visited. Each edge Line stays
+        with its child node and snaps to that node's new parent; nodes are not
+        moved on screen, animate them to their layout positions first. Returns
+        the list of newly created edges, already added to the scene (always
+        empty with batched edges).
+        """
+        # Edges go with their child node; the one left over serves a node that gained a parent
+        old_keys = {edge_key for index in index_map for edge_key in self._incident_edges.get(index, ())}
+        lines = {id(self.nodes[child_index]): self._pop_edge((parent_index, child_index))
+                 for parent_index, child_index in old_keys}
+        lines = {node_id: line for node_id, line in lines.items() if line is not None}  # None when batched
+        self._sync(*[self.nodes[index] for index in index_map], *lines.values())
+        
+        moved = [(new_index, self.nodes.pop(old_index), self.tree_data.pop(old_index))
+                 for old_index, new_index in index_map.items()]
+        for old_index in index_map:
+            self.positions.pop(old_index, None)
+        layout = self._layout_table(index_map.values())
+        for new_index, node, data in moved:
+            self.nodes[new_index] = node
+            self.tree_data[new_index] = data
+            self.positions[new_index] = layout[new_index]
+            self._node_indices[id(node)] = new_index
+        
+        wanted = [(new_index // 2, new_index) for new_index in index_map.values()
+                  if new_index > 1 and new_index // 2 in self.nodes]
+        unassigned = []
+        for edge_key in wanted:
+            line = lines.pop(id(self.nodes[edge_key[1]]), None)
+            if line is None:
+                unassigned.append(edge_key)
+            else:
+                self._store_edge(edge_key, line)
+        spare = list(lines.values())
+        new_edges = []
+        for edge_key in unassigned:
+            if spare:
+                self._store_edge(edge_key, spare.pop())
+            else:
+                new_edges.append(self._new_edge(*edge_key))
+        if spare and not self.batched_edges:
+            self.scene.remove(*spare)
+        
+        if self.batched_edges:
+            self.refresh_edge_mesh()
+            return []
+        for edge_key, points in zip(wanted, segment_points(*self._edge_endpoints(*self._edge_rows(wanted)))):
+            self.edges[edge_key].set_points(points)
+        if new_edges:
+            self.scene.add(*new_edges)
+        return new_edges
 
     def _get_level(self, index):
         """Get the level of a node (root is level 0)"""
-        level = 0
-        while index > 1:
-            index //= 2
-            level += 1
-        return level
+        return index.bit_length() - 1
 
+    @profiled
     def highlight_node(self, index, color=YELLOW, duration=0.5):
         """Highlight a node with a colored border"""
-        if index not in self.nodes:
-            return None
-        
-        node = self.nodes[index]
-        highlight_circle = Circle(
-            radius=0.5 * (self.radius / 0.3), 
-            color=color, 
-            stroke_width=6
-        ).move_to(node.get_center())
-        
-        self.scene.play(Create(highlight_circle), run_time=duration)
-        return highlight_circle
+        rings = self.highlight_nodes([index], color, duration)
+        return rings[0] if rings else None
 
+    @profiled
     def remove_highlight(self, highlight_circle, duration=0.3):
         """Remove a highlight"""
         if highlight_circle:
-            self.scene.play(FadeOut(highlight_circle), run_time=duration)
+            self.remove_highlights([highlight_circle], duration)
+
+    def _take_ring(self, color):
+        """A highlight ring from the pool (or a new one) sized for the current radius"""
+        if self._ring_pool:
+            ring = self._ring_pool.pop()
+            self._sync(ring)
+            ring.scale_to_fit_width(2 * 0.5 * (self.radius / 0.3))
+            ring.set_stroke(color, width=6, opacity=1)
+        else:
+            ring = Circle(radius=0.5 * (self.radius / 0.3), color=color, stroke_width=6)
+            self._ring_ids.add(id(ring))
+        return ring
+
+    @profiled
+    def highlight_nodes(self, indices, colors=YELLOW, duration=0.5):
+        """
+        Highlight several nodes with colored borders in a single animation.
+        colors is one color or a list cycled over the indices. Rings come
+        from a pool, so highlighting the same nodes again allocates nothing.
+        Returns the rings, for remove_highlights.
+        """
+        if not isinstance(colors, (list, tuple)):
+            colors = [colors]
+        indices = [index for index in indices if index in self.nodes]
+        if not indices:
+            return []
+        
+        self._sync(*[self.nodes[index] for index in indices])
+        rings = [self._take_ring(colors[i % len(colors)]).move_to(self.nodes[index].get_center())
+                 for i, index in enumerate(indices)]
+        self.scene.play(*[Create(ring) for ring in rings], run_time=duration)
+        return rings
 
+    @profiled
+    def remove_highlights(self, highlights, duration=0.3):
+        """Fade out several highlights in a single animation; rings go back to the pool"""
+        highlights = [highlight for highlight in highlights if highlight]
+        if not highlights:
+            return
+        
+        self.scene.play(*[FadeOut(highlight) for highlight in highlights], run_time=duration)
+        self._ring_pool.extend(highlight for highlight in highlights if id(highlight) in self._ring_ids)
+
+    @profiled
     def move_tree(self, dx=0, dy=0, scale_factor=1.0, duration=1.5):
         """
         Move the entire tree by (dx, dy) and scale by scale_factor.
         Positive dx moves right, positive dy moves up.
         scale_factor affects radius and spacing.
         """
+        self._sync(*self.nodes.values())
+        
         # Update tree parameters
         self.radius *= scale_factor
         self.level_height *= scale_factor
@@ -294,13 +1196,15 @@ class TreeStructure:
         
         # Prepare animations
         node_animations = []
-        edge_animations = []
+        
+        # Lay out every node for the new parameters in one batched pass
+        layout = self._layout_table(self.nodes)
         
         # Move and scale all nodes
         for index, node in self.nodes.items():
             # Calculate new position
-            new_position = self.calculate_position(index, self._get_level(index))
-            
+            new_position = layout[index]
+
             # Scale the node
             if scale_factor != 1.0:
                 node.scale_node(scale_factor)
@@ -312,21 +1216,7 @@ class TreeStructure:
             self.positions[index] = new_position
         
         # Animate all edges to follow nodes
-        for (parent_idx, child_idx), edge in self.edges.items():
-            if parent_idx in self.nodes and child_idx in self.nodes:
-                parent_node = self.nodes[parent_idx]
-                child_node = self.nodes[child_idx]
-                
-                def create_edge_updater(edge_line, p_node, c_node):
-                    def update_edge(mob, alpha):
-                        start_point = p_node.get_bottom()
-                        end_point = c_node.get_top()
-                        edge_line.put_start_and_end_on(start_point, end_point)
-                        return mob
-                    return UpdateFromAlphaFunc(edge_line, update_edge)
-                
-                edge_animation = create_edge_updater(edge, parent_node, child_node)
-                edge_animations.append(edge_animation)
+        edge_animations = self.edge_follow_animations()
         
         # Execute all animations simultaneously
         all_animations = node_animations + edge_animations
@@ -334,9 +1224,218 @@ class TreeStructure:
             self.scene.play(*all_animations, run_time=duration)
 
 
+class AnimationPlan:
+    """
+    Stand-in scene that records play, wait, add and remove calls instead of
+    running them, then emits them through as few scene.play calls as possible.
+    Consecutive plays that animate disjoint mobjects are merged into one
+    parallel play, back-to-back waits are merged and zero-length waits dropped.
+    Anything else is forwarded to the real scene.
+    """
+    def __init__(self, scene):
+        self.scene = scene
+        self._timeline = []  # ("play", animations, mobject ids) / ("wait", duration, kwargs) / ("add" | "remove", mobjects)
+
+    def __getattr__(self, name):
+        return getattr(self.scene, name)
+
+    def play(self, *animations, **kwargs):
+        animations = [prepare_animation(animation) for animation in animations]
+        # Same as Scene.play: keyword arguments apply to every animation
+        for animation in animations:
+            for key, value in kwargs.items():
+                setattr(animation, key, value)
+        mobject_ids = {id(mob) for animation in animations for mob in animation.mobject.get_family()}
+        self._timeline.append(("play", animations, mobject_ids))
+
+    def wait(self, duration=1.0, **kwargs):
+        self._timeline.append(("wait", duration, kwargs))
 
-def build_tree_from_list(tree_structure, data):
-    """Build tree from list data"""
+    def add(self, *mobjects):
+        self._timeline.append(("add", mobjects))
+
+    def remove(self, *mobjects):
+        self._timeline.append(("remove", mobjects))
+
+    def sync(self, *mobjects):
+        """Flush the plan if a pending animation touches any of these mobjects"""
+        wanted = {id(mob) for mobject in mobjects for mob in mobject.get_family()}
+        if any(event[0] == "play" and event[2] & wanted for event in self._timeline):
+            self.flush()
+
+    def compile(self):
+        """
+        Turn the recorded timeline into a list of ("play", group),
+        ("wait", duration, kwargs), ("add", mobjects) and ("remove", mobjects)
+        operations, where each group plays several recorded calls at once.
+        """
+        operations = []
+        group = None
+        pending_adds = []
+        
+        def close_group():
+            nonlocal group
+            if group is not None:
+                operations.append(("play", group))
+                group = None
+        
+        for event in self._timeline:
+            kind = event[0]
+            if kind == "play":
+                _, animations, mobject_ids = event
+                added_ids = {id(mob) for mobject in pending_adds for mob in mobject.get_family()}
+                if group is not None and not ((mobject_ids | added_ids) & (group["ids"] | group["removed_ids"])):
+                    # Touches nothing the current group does, so it can run alongside it
+                    group["animations"].extend(animations)
+                    group["ids"] |= mobject_ids
+                    group["adds"].extend(pending_adds)
+                else:
+                    close_group()
+                    group = {"animations": list(animations), "ids": set(mobject_ids), "adds": pending_adds,
+                             "removes": [], "removed_ids": set()}
+                pending_adds = []
+            elif kind == "add":
+                # Added right before the next play, which is when it would have appeared
+                pending_adds.extend(event[1])
+            elif kind == "remove":
+                if pending_adds:
+                    close_group()
+                    operations.append(("add", pending_adds))
+                    pending_adds = []
+                if group is not None:
+                    group["removes"].extend(event[1])
+                    group["removed_ids"] |= {id(mob) for mobject in event[1] for mob in mobject.get_family()}
+                else:
+                    operations.append(("remove", event[1]))
+            elif kind == "wait":
+                close_group()
+                if pending_adds:
+                    operations.append(("add", pending_adds))
+                    pending_adds = []
+                _, duration, kwargs = event
+                if duration <= 0 and not kwargs:
+                    continue
+                if operations and operations[-1][0] == "wait" and not kwargs and not operations[-1][2]:
+                    operations[-1] = ("wait", operations[-1][1] + duration, {})
+                else:
+                    operations.append(("wait", duration, kwargs))
+        
+        close_group()
+        if pending_adds:
+            operations.append(("add", pending_adds))
+        return operations
+
+    def flush(self):
+        """Compile what has been recorded so far and play it on the real scene"""
+        operations = self.compile()
+        self._timeline = []
+        for operation in operations:
+            kind = operation[0]
+            if kind == "play":
+                group = operation[1]
+                if group["adds"]:
+                    self.scene.add(*group["adds"])
+                self.scene.play(*group["animations"])
+                if group["removes"]:
+                    self.scene.remove(*group["removes"])
+            elif kind == "wait":
+                self.scene.wait(operation[1], **operation[2])
+            elif kind == "add":
+                self.scene.add(*operation[1])
+            else:
+                self.scene.remove(*operation[1])
+
+class NullScene:
+    """
+    Dry-run stand-in for a Manim Scene. Every animation jumps straight to its
+    end state and no frames are rendered, while each call and the virtual
+    time it would have taken are recorded. Trees built on it end up with the
+    same tree_data, positions and mobjects as on a real scene.
+    """
+    def __init__(self):
+        self._mobjects = {}  # id -> mobject, in scene order
+        self.calls = []  # ("play", animation count, run_time) / ("wait", duration) / ("add" | "remove", mobject count)
+        self.time = 0.0
+        self.play_count = 0
+        self.animation_count = 0
+
+    @classmethod
+    def run(cls, scene_class):
+        """
+        Run a Scene subclass's construct() against a NullScene and return it.
+        The scene class is mixed in below NullScene, so construct() can call
+        the class's own helpers while play, wait, add and remove stay headless.
+        """
+        null_scene = type(scene_class.__name__, (cls, scene_class), {})()
+        null_scene.construct()
+        return null_scene
+
+    @property
+    def mobjects(self):
+        return list(self._mobjects.values())
+
+    def get_mobject_family_members(self):
+        return [mob for mobject in self._mobjects.values() for mob in mobject.get_family()]
+
+    def add(self, *mobjects):
+        for mobject in mobjects:
+            # Like Scene.add, re-adding moves a mobject to the top
+            self._mobjects.pop(id(mobject), None)
+            self._mobjects[id(mobject)] = mobject
+        self.calls.append(("add", len(mobjects)))
+        return self
+
+    def remove(self, *mobjects):
+        for mobject in mobjects:
+            self._mobjects.pop(id(mobject), None)
+        self.calls.append(("remove", len(mobjects)))
+        return self
+
+    def replace(self, old_mobject, new_mobject):
+        if id(old_mobject) in self._mobjects:
+            self._mobjects = {(id(new_mobject) if key == id(old_mobject) else key):
+                              (new_mobject if key == id(old_mobject) else mobject)
+                              for key, mobject in self._mobjects.items()}
+        return self
+
+    def play(self, *animations, **kwargs):
+        animations = [prepare_animation(animation) for animation in animations]
+        for animation in animations:
+            for key, value in kwargs.items():
+                setattr(animation, key, value)
+        
+        # Same lifecycle as a real play, minus the frames in between
+        for animation in animations:
+            animation._setup_scene(self)
+            animation.begin()
+        for animation in animations:
+            animation.finish()
+        for animation in animations:
+            animation.clean_up_from_scene(self)
+        
+        run_time = max((animation.run_time for animation in animations), default=0)
+        self.time += run_time
+        self.play_count += 1
+        self.animation_count += len(animations)
+        self.calls.append(("play", len(animations), run_time))
+
+    def wait(self, duration=1.0, **kwargs):
+        self.time += duration
+        self.calls.append(("wait", duration))
+
+
+@profiled
+def build_tree_from_list(tree_structure, data, batched=False, lag_ratio=0, run_time=1.0):
+    """
+    Build tree from list data.
+    With batched=True every node and edge is created up front and the whole
+    tree is animated in one scene.play (staggered when lag_ratio > 0).
+    """
+    if batched:
+        nodes_data = [(i, item[1:], item[0]) for i, item in enumerate(data, 1) if item is not None]
+        tree_structure.add_nodes(nodes_data, lag_ratio=lag_ratio, run_time=run_time)
+        return
+    
     for i, item in enumerate(data, 1):
         if item is not None:
             color_char = item[0]
@@ -346,26 +1445,30 @@ def build_tree_from_list(tree_structure, data):
     # Add edges
     tree_structure.rebuild_edges()
 
+@profiled
 def collect_subtree_nodes(tree_structure, root_index):
+    """Return the indices of a subtree in preorder (root, left, right)"""
     subtree = []
-    def collect_recursive(index):
+    # Explicit stack so deep trees don't hit the recursion limit
+    stack = [root_index]
+    while stack:
+        index = stack.pop()
         if index in tree_structure.nodes:
             subtree.append(index)
-            collect_recursive(2 * index)      
-            collect_recursive(2 * index + 1)  
-    collect_recursive(root_index)
+            stack.append(2 * index + 1)
+            stack.append(2 * index)
     return subtree
 
 def is_in_subtree(node_index, root_index):
     if node_index == root_index:
         return True
     
-    # Traverse up from node_index to see if we reach root_index
-    current = node_index
-    while current > root_index:
-        current = current // 2
+    # Shift node_index up to root_index's level and compare
+    depth_below = node_index.bit_length() - root_index.bit_length()
+    if depth_below < 0:
+        return False
     
-    return current == root_index
+    return (node_index >> depth_below) == root_index
 
 def get_relative_path(node_index, root_index):
     #Get the path from root_index to node_index as a list of 'L'/'R' moves
@@ -394,275 +1497,127 @@ def apply_relative_path(root_index, path):
             current = 2 * current + 1
     return current
 
+def shift_index(node_index, old_root, new_root):
+    """
+    Index that node_index (inside the subtree at old_root) gets when the
+    whole subtree moves to new_root: a node k levels below the root keeps
+    its offset within its level, which shifts by (new_root - old_root) * 2^k.
+    """
+    depth_below = node_index.bit_length() - old_root.bit_length()
+    return node_index + ((new_root - old_root) << depth_below)
+
+@profiled
 def move_subtree(tree_structure, new_node_map, new_data_map, old_root, new_root):
     """
     Helper function to move an entire subtree from old_root to new_root position.
-    First moves the root, then recursively moves children based on parent-child relationships.
+    Every node keeps its place relative to the root (see shift_index).
     """
-    if old_root not in tree_structure.nodes:
-        return
-    
-    # Create a mapping from old indices to new indices
-    index_mapping = {}
-    
-    # First, move the root
-    new_node_map[new_root] = tree_structure.nodes[old_root]
-    new_data_map[new_root] = tree_structure.tree_data[old_root]
-    index_mapping[old_root] = new_root
-    
-    # Get all nodes in subtree and sort them by level (breadth-first order)
-    # This ensures parents are processed before children
-    subtree_nodes = []
-    for old_index in range(1, 63):
-        if (is_in_subtree(old_index, old_root) and 
-            old_index in tree_structure.nodes and 
-            old_index != old_root):
-            subtree_nodes.append(old_index)
-    
-    # Sort by level (smaller indices = higher levels, processed first)
-    subtree_nodes.sort()
-    
-    # Process nodes level by level
-    for old_index in subtree_nodes:
-        # Find the parent of this node
-        old_parent_index = old_index // 2
-        
-        # The parent should already be in index_mapping
-        if old_parent_index not in index_mapping:
-            continue  # Skip if parent not processed yet
-            
-        new_parent_index = index_mapping[old_parent_index]
-        is_left_child = (old_index % 2 == 0)  # Even indices are left children
-
-        # Calculate new index based on parent-child relationship
-        if is_left_child:
-            new_index = 2 * new_parent_index      # Left child
-        else:
-            new_index = 2 * new_parent_index + 1  # Right child
-                
-        # Move the node
+    # Walk only the nodes that actually exist in the subtree
+    for old_index in collect_subtree_nodes(tree_structure, old_root):
+        new_index = shift_index(old_index, old_root, new_root)
         new_node_map[new_index] = tree_structure.nodes[old_index]
         new_data_map[new_index] = tree_structure.tree_data[old_index]
-        index_mapping[old_index] = new_index
 
+@profiled
 def left_rotate(scene, tree_structure, l_index, highlight=True):
 
     right_child_index = 2 * l_index + 1  # Right child of l
+    tree_structure.touch(l_index, right_child_index)
     
     if l_index not in tree_structure.nodes or right_child_index not in tree_structure.nodes:
         return
     
     if highlight:
         # Highlight the nodes being rotated
-        l_highlight = tree_structure.highlight_node(l_index, color=RED, duration=0.3)
-        right_highlight = tree_structure.highlight_node(right_child_index, color=GREEN, duration=0.3)
+        highlights = tree_structure.highlight_nodes([l_index, right_child_index], [RED, GREEN], duration=0.3)
         scene.wait(0.5)
     
-    # Get the nodes involved in rotation
-    l_node = tree_structure.nodes[l_index]
-    r_node = tree_structure.nodes[right_child_index]
-    l_data = tree_structure.tree_data[l_index]
-    r_data = tree_structure.tree_data[right_child_index]
-    
     # Calculate indices for all relevant positions
     l_left_index = 2 * l_index          # Left child of l (A)
     r_left_index = 2 * right_child_index    # Left child of r (B)  
     r_right_index = 2 * right_child_index + 1  # Right child of r (C)
     
-    # Create new node and data mappings
-    new_node_map = {}
-    new_data_map = {}
+    # Perform the rotation: only the subtree at l moves
+    # 1. r (right child) moves to l's position, l moves to its own left child's position
+    index_map = {l_index: l_left_index, right_child_index: l_index}
     
-    # Perform the rotation:
+    # 2. A moves one level down below l, B becomes l's right child, C becomes r's right child
+    for old_root, new_root in ((l_left_index, 2 * l_left_index),
+                               (r_left_index, 2 * l_left_index + 1),
+                               (r_right_index, right_child_index)):
+        for index in collect_subtree_nodes(tree_structure, old_root):
+            index_map[index] = shift_index(index, old_root, new_root)
 
-    # Things that don't move (Necessary to rebuild edges)
-    for index in range(1,63):
-        if not is_in_subtree(index, l_index) and index in tree_structure.tree_data:
-            new_data_map[index] = tree_structure.tree_data[index]
-            new_node_map[index] = tree_structure.nodes[index]
+    # Move the subtree's nodes to their new positions, with their edges following
+    layout = tree_structure._layout_table(index_map.values())
+    tree_structure._sync(*[tree_structure.nodes[index] for index in index_map])
+    node_animations = [tree_structure.nodes[old_index].animate.move_to(layout[new_index])
+                       for old_index, new_index in index_map.items()]
+    edge_animations = tree_structure.edge_follow_animations(index_map)
+    scene.play(*node_animations, *edge_animations, run_time=1.2)
 
-    # 1. r (right child) moves to l's position
-    new_node_map[l_index] = r_node
-    new_data_map[l_index] = r_data
-    
-    # 2. l moves to r's left child position
-    new_node_map[l_index*2] = l_node
-    new_data_map[l_index*2] = l_data
-    
-    # 3. Handle subtree movements
-    # r's left child (B) becomes l's right child
-    if r_left_index in tree_structure.nodes:
-        # Move B subtree to be right child of l in its new position
-        move_subtree(tree_structure, new_node_map, new_data_map, 
-                    r_left_index, (2 * l_index)*2 + 1)
-    if l_left_index in tree_structure.nodes:
-        move_subtree(tree_structure, new_node_map, new_data_map,l_left_index, 2 * l_left_index)
-    if r_right_index in tree_structure.nodes:
-        # Move C subtree to be left child of r in its new position
-        move_subtree(tree_structure, new_node_map, new_data_map, 
-                    r_right_index, 2 * l_index + 1)
-
-    # Create animations for all nodes to move to their new positions
-    node_animations = []
-    for new_index, node in new_node_map.items():
-        level = tree_structure._get_level(new_index)
-        new_pos = tree_structure.calculate_position(new_index, level)
-        node_animations.append(node.animate.move_to(new_pos))
-    
-    # Create edge animations that follow the nodes
-    edge_animations = []
-    for (parent_idx, child_idx), edge in tree_structure.edges.items():
-        if parent_idx in tree_structure.nodes and child_idx in tree_structure.nodes:
-            parent_node = tree_structure.nodes[parent_idx]
-            child_node = tree_structure.nodes[child_idx]
-            
-            def create_edge_updater(edge_line, p_node, c_node):
-                def update_edge(mob, alpha):
-                    # Update edge endpoints to follow nodes
-                    start_point = p_node.get_bottom()
-                    end_point = c_node.get_top()
-                    edge_line.put_start_and_end_on(start_point, end_point)
-                    return mob
-                return UpdateFromAlphaFunc(edge_line, update_edge)
-            
-            edge_animation = create_edge_updater(edge, parent_node, child_node)
-            edge_animations.append(edge_animation)
-    
-    # Execute all animations simultaneously (nodes + edges)
-    all_animations = node_animations + edge_animations
-    if all_animations:
-        scene.play(*all_animations, run_time=1.2)
-    
-
-    # Update tree structure with new mapping
-    tree_structure.nodes = new_node_map
-    tree_structure.tree_data = new_data_map
-    
-    # Update positions
-    for new_index, node in new_node_map.items():
-        level = tree_structure._get_level(new_index)
-        new_pos = tree_structure.calculate_position(new_index, level)
-        tree_structure.positions[new_index] = new_pos
-    
-    # Rebuild edges to match new tree structure
-    tree_structure.rebuild_edges()
-
-    
+    # Update the tree structure and the edges of the subtree in place
+    tree_structure.remap_nodes(index_map)
     
     if highlight:
         # Remove highlights
-        tree_structure.remove_highlight(l_highlight, duration=0.3)
-        tree_structure.remove_highlight(right_highlight, duration=0.3)
+        tree_structure.remove_highlights(highlights, duration=0.3)
 
+@profiled
 def right_rotate(scene, tree_structure, r_index, highlight=True):
 
     l_index = 2 * r_index 
+    tree_structure.touch(r_index, l_index)
     if r_index not in tree_structure.nodes or l_index not in tree_structure.nodes:
         return
     
     if highlight:
         # Highlight the nodes being rotated
-        r_highlight = tree_structure.highlight_node(r_index, color=RED, duration=0.3)
-        left_highlight = tree_structure.highlight_node(l_index, color=GREEN, duration=0.3)
+        highlights = tree_structure.highlight_nodes([r_index, l_index], [RED, GREEN], duration=0.3)
         scene.wait(0.5)
     
-    # Get the nodes involved in rotation
-    l_node = tree_structure.nodes[l_index]
-    r_node = tree_structure.nodes[r_index]
-    l_data = tree_structure.tree_data[l_index]
-    r_data = tree_structure.tree_data[r_index]
-    
     # Calculate indices for all relevant positions
     l_right_child = 2 * l_index +1  
     l_left_child = 2 * l_index
     r_right_child= 2 * r_index + 1  
     
-    # Create new node and data mappings
-    new_node_map = {}
-    new_data_map = {}
-    
-    # Perform the rotation:
-
-    # Things that don't move (Necessary to rebuild edges)
-    for index in range(1,63):
-        if not is_in_subtree(index, r_index) and index in tree_structure.tree_data:
-            new_data_map[index] = tree_structure.tree_data[index]
-            new_node_map[index] = tree_structure.nodes[index]
-
-    # 1. l moves to r's position
-    new_node_map[r_index] = l_node
-    new_data_map[r_index] = l_data
-    new_node_map[r_right_child] = r_node
-    new_data_map[r_right_child] = r_data
+    # Perform the rotation: only the subtree at r moves
+    # 1. l moves to r's position, r moves to its own right child's position
+    index_map = {r_index: r_right_child, l_index: r_index}
     
-    # 3. Handle subtree movements
-    if l_left_child in tree_structure.nodes:
-        move_subtree(tree_structure, new_node_map, new_data_map, l_left_child, l_index)
-    if l_right_child in tree_structure.nodes:
-        move_subtree(tree_structure, new_node_map, new_data_map, l_right_child, 2*(r_index*2+1))
-    if r_right_child in tree_structure.nodes:
-        move_subtree(tree_structure, new_node_map, new_data_map, r_right_child, r_right_child*2+1)
-
-    
-    # Create animations for all nodes to move to their new positions
-    node_animations = []
-    for new_index, node in new_node_map.items():
-        level = tree_structure._get_level(new_index)
-        new_pos = tree_structure.calculate_position(new_index, level)
-        node_animations.append(node.animate.move_to(new_pos))
-    
-    # Create edge animations that follow the nodes
-    edge_animations = []
-    for (parent_idx, child_idx), edge in tree_structure.edges.items():
-        if parent_idx in tree_structure.nodes and child_idx in tree_structure.nodes:
-            parent_node = tree_structure.nodes[parent_idx]
-            child_node = tree_structure.nodes[child_idx]
-            
-            def create_edge_updater(edge_line, p_node, c_node):
-                def update_edge(mob, alpha):
-                    # Update edge endpoints to follow nodes
-                    start_point = p_node.get_bottom()
-                    end_point = c_node.get_top()
-                    edge_line.put_start_and_end_on(start_point, end_point)
-                    return mob
-                return UpdateFromAlphaFunc(edge_line, update_edge)
-            
-            edge_animation = create_edge_updater(edge, parent_node, child_node)
-            edge_animations.append(edge_animation)
+    # 2. A moves up to l's position, B becomes r's left child, C moves one level down below r
+    for old_root, new_root in ((l_left_child, l_index),
+                               (l_right_child, 2 * r_right_child),
+                               (r_right_child, 2 * r_right_child + 1)):
+        for index in collect_subtree_nodes(tree_structure, old_root):
+            index_map[index] = shift_index(index, old_root, new_root)
     
-    # Execute all animations simultaneously (nodes + edges)
-    all_animations = node_animations + edge_animations
-    if all_animations:
-        scene.play(*all_animations, run_time=1.2)
+    # Move the subtree's nodes to their new positions, with their edges following
+    layout = tree_structure._layout_table(index_map.values())
+    tree_structure._sync(*[tree_structure.nodes[index] for index in index_map])
+    node_animations = [tree_structure.nodes[old_index].animate.move_to(layout[new_index])
+                       for old_index, new_index in index_map.items()]
+    edge_animations = tree_structure.edge_follow_animations(index_map)
+    scene.play(*node_animations, *edge_animations, run_time=1.2)
     
-    # Update tree structure with new mapping
-    tree_structure.nodes = new_node_map
-    tree_structure.tree_data = new_data_map
-    
-    # Update positions
-    for new_index, node in new_node_map.items():
-        level = tree_structure._get_level(new_index)
-        new_pos = tree_structure.calculate_position(new_index, level)
-        tree_structure.positions[new_index] = new_pos
-    
-    # Rebuild edges to match new tree structure
-    tree_structure.rebuild_edges()
+    # Update the tree structure and the edges of the subtree in place
+    tree_structure.remap_nodes(index_map)
     
     if highlight:
         # Remove highlights
-        tree_structure.remove_highlight(r_highlight, duration=0.3)
-        tree_structure.remove_highlight(left_highlight, duration=0.3)
+        tree_structure.remove_highlights(highlights, duration=0.3)
 
+@profiled
 def left_swap(scene, tree_structure, x_index):
     """Simple left swap - just exchange positions of x and its right child"""
     y_index = 2 * x_index + 1  # Right child of x
+    tree_structure.touch(x_index, y_index)
     
     if x_index not in tree_structure.nodes or y_index not in tree_structure.nodes:
         return
     
     # Highlight the nodes being swapped
-    x_highlight = tree_structure.highlight_node(x_index, color=RED, duration=0.3)
-    y_highlight = tree_structure.highlight_node(y_index, color=GREEN, duration=0.3)
+    highlights = tree_structure.highlight_nodes([x_index, y_index], [RED, GREEN], duration=0.3)
     scene.wait(0.5)
     
     # Perform the swap by exchanging positions only
@@ -673,19 +1628,19 @@ def left_swap(scene, tree_structure, x_index):
     tree_structure.rebuild_edges()
     
     # Remove highlights
-    tree_structure.remove_highlight(x_highlight, duration=0.3)
-    tree_structure.remove_highlight(y_highlight, duration=0.3)
+    tree_structure.remove_highlights(highlights, duration=0.3)
 
+@profiled
 def right_swap(scene, tree_structure, y_index):
     """Simple right swap - just exchange positions of y and its left child"""
     x_index = 2 * y_index  # Left child of y
+    tree_structure.touch(y_index, x_index)
     
     if y_index not in tree_structure.nodes or x_index not in tree_structure.nodes:
         return
     
     # Highlight the nodes being swapped
-    y_highlight = tree_structure.highlight_node(y_index, color=RED, duration=0.3)
-    x_highlight = tree_structure.highlight_node(x_index, color=GREEN, duration=0.3)
+    highlights = tree_structure.highlight_nodes([y_index, x_index], [RED, GREEN], duration=0.3)
     scene.wait(0.5)
     
     # Perform the swap by exchanging positions only
@@ -696,17 +1651,17 @@ def right_swap(scene, tree_structure, y_index):
     tree_structure.rebuild_edges()
     
     # Remove highlights
-    tree_structure.remove_highlight(y_highlight, duration=0.3)
-    tree_structure.remove_highlight(x_highlight, duration=0.3)
+    tree_structure.remove_highlights(highlights, duration=0.3)
 
+@profiled
 def swap_node_values(scene, tree_structure, index1, index2, duration=1.5):
     """Swap values between two nodes with animation"""
+    tree_structure.touch(index1, index2)
     if index1 not in tree_structure.nodes or index2 not in tree_structure.nodes:
         return
     
     # Highlight nodes
-    highlight1 = tree_structure.highlight_node(index1, color=YELLOW, duration=0.3)
-    highlight2 = tree_structure.highlight_node(index2, color=BLUE, duration=0.3)
+    highlights = tree_structure.highlight_nodes([index1, index2], [YELLOW, BLUE], duration=0.3)
     
     scene.wait(0.5)
     
@@ -717,9 +1672,10 @@ def swap_node_values(scene, tree_structure, index1, index2, duration=1.5):
     # Create temporary text for animation
     node1 = tree_structure.nodes[index1]
     node2 = tree_structure.nodes[index2]
-    
-    temp_text1 = Text(label1, font_size=24, color=WHITE).move_to(node1.get_center())
-    temp_text2 = Text(label2, font_size=24, color=WHITE).move_to(node2.get_center())
+    tree_structure._sync(node1, node2)
+
+    temp_text1 = make_label(label1, 24).move_to(node1.get_center())
+    temp_text2 = make_label(label2, 24).move_to(node2.get_center())
     
     tree_structure.update_node_data(index1, new_label=" ")
     tree_structure.update_node_data(index2, new_label=" ")
@@ -739,15 +1695,16 @@ def swap_node_values(scene, tree_structure, index1, index2, duration=1.5):
     tree_structure.update_node_data(index2, new_label=label1)
     
     # Remove highlights
-    tree_structure.remove_highlight(highlight1, duration=0.3)
-    tree_structure.remove_highlight(highlight2, duration=0.3)
+    tree_structure.remove_highlights(highlights, duration=0.3)
 
+@profiled
 def mark_for_deletion(scene, tree_structure, index, duration=0.8):
     """Mark a node for deletion with blue X"""
     if index not in tree_structure.nodes:
         return None
     
     node = tree_structure.nodes[index]
+    tree_structure._sync(node)
     
     # Create X mark
     x_mark = VGroup(
@@ -758,22 +1715,46 @@ def mark_for_deletion(scene, tree_structure, index, duration=0.8):
     scene.play(Create(x_mark), run_time=duration)
     return x_mark
 
+@profiled
 def find_inorder_successor(tree_structure, node_index):
     """Find the inorder successor of a node (leftmost node in right subtree)"""
     # Go to right child
     right_child = 2 * node_index + 1
+    tree_structure.touch(node_index)
     if right_child not in tree_structure.nodes:
         return None
     
     # Keep going left until no more left children
     current = right_child
+    tree_structure.touch(current)
     while 2 * current in tree_structure.nodes:  # While left child exists
         current = 2 * current
-    
+        tree_structure.touch(current)
+
     return current
 
+@profiled
+def search_path(tree_structure, target, key=int):
+    """
+    Indices a binary search for target visits, from the root down to the
+    node holding it, or to the last node before the search leaves the tree.
+    key turns a node label into a value comparable with target.
+    """
+    path = []
+    index = 1
+    while True:
+        tree_structure.touch(index)
+        if index not in tree_structure.tree_data:
+            return path
+        path.append(index)
+        node_key = key(tree_structure.tree_data[index][0])
+        if target == node_key:
+            return path
+        index = 2 * index + (target > node_key)
+
 def count_children(tree_structure, node_index):
     """Count how many children a node has"""
+    tree_structure.touch(node_index)
     left_child = 2 * node_index
     right_child = 2 * node_index + 1
     
@@ -785,71 +1766,32 @@ def count_children(tree_structure, node_index):
     
     return count
 
+@profiled
 def move_subtree_up(scene, tree_structure, deleted_index, child_index):
     """Move an entire subtree up when its parent is deleted"""
     if child_index not in tree_structure.nodes:
         return
     
-    # Get all nodes in the subtree rooted at child_index
-    subtree_nodes = collect_subtree_nodes(tree_structure, child_index)
-    
-    # Create mapping: child_index takes deleted_index position, 
-    # and all other nodes in subtree maintain their relative structure
-    new_mapping = {}
-    
-    # The child takes the deleted node's position
-    new_mapping[child_index] = deleted_index
-    
-    # For other nodes in subtree, we need to maintain the tree structure
-    # by calculating their new positions relative to the new root
-    for node_idx in subtree_nodes:
-        if node_idx != child_index:
-            # Find the path from child_index to node_idx
-            path = get_relative_path(node_idx, child_index)
-            # Apply this path starting from the new position (deleted_index)
-            new_index = apply_relative_path(deleted_index, path)
-            new_mapping[node_idx] = new_index
-    
-    # Animate movement
-    animations = []
-    for old_idx, new_idx in new_mapping.items():
-        if old_idx in tree_structure.nodes:
-            node = tree_structure.nodes[old_idx]
-            new_pos = tree_structure.calculate_position(new_idx, tree_structure._get_level(new_idx))
-            animations.append(node.animate.move_to(new_pos))
-    
-    if animations:
-        scene.play(*animations, run_time=1.0)
-    
-    # Update tree structure
-    new_nodes = {}
-    new_data = {}
-    new_positions = {}
-    
-    for old_idx, new_idx in new_mapping.items():
-        if old_idx in tree_structure.nodes:
-            new_nodes[new_idx] = tree_structure.nodes[old_idx]
-            new_data[new_idx] = tree_structure.tree_data[old_idx]
-            new_positions[new_idx] = tree_structure.calculate_position(new_idx, tree_structure._get_level(new_idx))
-    
-    # Remove old entries
-    for old_idx in subtree_nodes:
-        if old_idx in tree_structure.nodes:
-            del tree_structure.nodes[old_idx]
-            del tree_structure.tree_data[old_idx]
-            if old_idx in tree_structure.positions:
-                del tree_structure.positions[old_idx]
-    
-    # Add new entries
-    tree_structure.nodes.update(new_nodes)
-    tree_structure.tree_data.update(new_data)
-    tree_structure.positions.update(new_positions)
-    
-    # Rebuild edges
-    tree_structure.rebuild_edges()
+    # child_index takes deleted_index's position and every other node of its
+    # subtree keeps its place relative to it
+    index_map = {index: shift_index(index, child_index, deleted_index)
+                 for index in collect_subtree_nodes(tree_structure, child_index)}
+    
+    # Animate movement, with the subtree's edges following
+    layout = tree_structure._layout_table(index_map.values())
+    tree_structure._sync(*[tree_structure.nodes[index] for index in index_map])
+    node_animations = [tree_structure.nodes[old_index].animate.move_to(layout[new_index])
+                       for old_index, new_index in index_map.items()]
+    edge_animations = tree_structure.edge_follow_animations(index_map)
+    scene.play(*node_animations, *edge_animations, run_time=1.0)
+    
+    # Update tree structure and the subtree's edges in place
+    tree_structure.remap_nodes(index_map)
 
+@profiled
 def delete_node(scene, tree_structure, target_index):
     """Delete a node following the three cases of binary tree deletion"""
+    tree_structure.touch(target_index)
     if target_index not in tree_structure.nodes:
         return
     
@@ -886,91 +1828,26 @@ def delete_node(scene, tree_structure, target_index):
         scene.play(FadeOut(deletion_mark), run_time=0.3)
         tree_structure.remove_node(target_index, animate=True)
         
-        # Prepare new node mapping
-        new_node_map = {}
-        new_data_map = {}
-        for index in range(1, 63):
-            if index in tree_structure.nodes and not is_in_subtree(index, target_index):
-                new_node_map[index] = tree_structure.nodes[index]
-                new_data_map[index] = tree_structure.tree_data[index]
-        
-        move_subtree(tree_structure, new_node_map, new_data_map, child_index, target_index)
-        
-        # Create animations for all nodes to move to their new positions
-        node_animations = []
-        for new_index, node in new_node_map.items():
-            level = tree_structure._get_level(new_index)
-            new_pos = tree_structure.calculate_position(new_index, level)
-            node_animations.append(node.animate.move_to(new_pos))
-        
-        # Create edge animations - only for edges that will persist
-        edge_animations = []
-        edges_to_remove = []
-        
-        for (parent_idx, child_idx), edge in tree_structure.edges.items():
-            # Check if this edge will exist after the transformation
-            parent_new_idx = None
-            child_new_idx = None
-            
-            # Find where parent and child will be in new mapping
-            for new_idx, old_node in new_node_map.items():
-                if old_node == tree_structure.nodes.get(parent_idx):
-                    parent_new_idx = new_idx
-                if old_node == tree_structure.nodes.get(child_idx):
-                    child_new_idx = new_idx
-            
-            if parent_new_idx is not None and child_new_idx is not None:
-                # This edge will persist - animate it
-                parent_node = tree_structure.nodes[parent_idx]
-                child_node = tree_structure.nodes[child_idx]
-                
-                def create_edge_updater(edge_line, p_node, c_node):
-                    def update_edge(mob, alpha):
-                        start_point = p_node.get_bottom()
-                        end_point = c_node.get_top()
-                        edge_line.put_start_and_end_on(start_point, end_point)
-                        return mob
-                    return UpdateFromAlphaFunc(edge_line, update_edge)
-                
-                edge_animation = create_edge_updater(edge, parent_node, child_node)
-                edge_animations.append(edge_animation)
-            else:
-                # This edge will be removed - mark it for deletion
-                edges_to_remove.append(edge)
-        
-        # Remove edges that won't exist anymore
-        if edges_to_remove:
-            scene.play(*[FadeOut(edge) for edge in edges_to_remove], run_time=0.3)
+        # The child's subtree moves up into the target's place; nothing else moves
+        index_map = {index: shift_index(index, child_index, target_index)
+                     for index in collect_subtree_nodes(tree_structure, child_index)}
         
-
+        # Create animations for the subtree's nodes and the edges that follow them
+        layout = tree_structure._layout_table(index_map.values())
+        tree_structure._sync(*[tree_structure.nodes[index] for index in index_map])
+        node_animations = [tree_structure.nodes[old_index].animate.move_to(layout[new_index])
+                           for old_index, new_index in index_map.items()]
+        edge_animations = tree_structure.edge_follow_animations(index_map)
 
         # Execute node animations and persisting edge animations simultaneously
         tree_structure.remove_highlight(child_highlight, duration=0.3) #remove the highlight
-        all_animations = node_animations + edge_animations
-        if all_animations:
-            scene.play(*all_animations, run_time=1.0)
+        scene.play(*node_animations, *edge_animations, run_time=1.0)
         
         # Update tree structure with new mapping AFTER animation
-        tree_structure.nodes = new_node_map
-        tree_structure.tree_data = new_data_map
-        
-        # Update positions
-        for new_index, node in new_node_map.items():
-            level = tree_structure._get_level(new_index)
-            new_pos = tree_structure.calculate_position(new_index, level)
-            tree_structure.positions[new_index] = new_pos
-        
-        # Create new edges that didn't exist before
-        tree_structure.rebuild_edges()
+        new_edges = tree_structure.remap_nodes(index_map)
         
         # Animate in any new edges
-        new_edges = []
-        for (parent_idx, child_idx), edge in tree_structure.edges.items():
-            # This is a newly created edge
-            new_edges.append(edge)
-        
-        if new_edges:
-            scene.play(*[Create(edge) for edge in new_edges], run_time=0.5)
+        tree_structure._show_edges(new_edges, animate=True)
         
     else:
         # Case 3: Two children - find successor, swap values, then delete successor
@@ -999,35 +1876,70 @@ def show_deletion_steps(scene, tree_structure, target_index, successor_index=Non
     """Demonstrate complete deletion process using proper binary tree deletion"""
     delete_node(scene, tree_structure, target_index)
 
+@profiled
 def animate_rebalancing(scene, tree_structure, affected_indices, duration=2.0):
     """Animate rebalancing process"""
     # Highlight affected nodes
-    highlights = []
     colors = [BLUE, PURPLE, ORANGE, PINK, TEAL]
-    
-    for i, index in enumerate(affected_indices):
-        if index in tree_structure.nodes:
-            color = colors[i % len(colors)]
-            highlight = tree_structure.highlight_node(index, color=color, duration=0.3)
-            highlights.append(highlight)
-            scene.wait(0.2)
+    highlights = tree_structure.highlight_nodes(affected_indices, colors, duration=0.3)
     
     scene.wait(duration)
     
     # Remove highlights
-    for highlight in highlights:
-        tree_structure.remove_highlight(highlight, duration=0.2)
+    tree_structure.remove_highlights(highlights, duration=0.2)
 
+@profiled
 def change_colors(scene, tree_structure, indices, colors):
-    """Change colors of multiple nodes"""
-    animations = []
-    color_map = {"B": BLACK, "R": RED, "O": ORANGE}
-    
-    for i, c in zip(indices, colors):
-        if i in tree_structure.nodes:
-            node = tree_structure.nodes[i]
-            animations.append(node.circle.animate.set_fill(color_map.get(c, WHITE)))
-            tree_structure.update_node_data(i, new_color_char=c)
-    
-    if animations:
-        scene.play(*animations, run_time=0.4)
+    """Change colors of multiple nodes in one animation (see TreeStructure.recolor)"""
+    tree_structure.recolor(dict(zip(indices, colors)))
+
+@profiled
+def apply_step(scene, tree_structure, step, highlight=False):
+    """Replay one primitive step produced by RBTreeModel"""
+    kind = step[0]
+    if kind == "insert":
+        _, index, label, color_char = step
+        tree_structure.touch(index // 2)
+        tree_structure.add_nodes([(index, label, color_char)], run_time=0.3)
+    elif kind == "recolor":
+        _, index, color_char = step
+        tree_structure.recolor({index: color_char})
+    elif kind == "rotate_left":
+        left_rotate(scene, tree_structure, step[1], highlight=highlight)
+    elif kind == "rotate_right":
+        right_rotate(scene, tree_structure, step[1], highlight=highlight)
+    elif kind == "swap_values":
+        swap_node_values(scene, tree_structure, step[1], step[2])
+    elif kind == "remove":
+        # The node has at most one child, whose subtree moves up into its place
+        index = step[1]
+        tree_structure.touch(index)
+        child_index = 2 * index if 2 * index in tree_structure.nodes else 2 * index + 1
+        tree_structure.remove_node(index, animate=True)
+        if child_index in tree_structure.nodes:
+            move_subtree_up(scene, tree_structure, index, child_index)
+    else:
+        raise ValueError("Unknown step: %r" % (kind,))
+
+@profiled
+def replay_steps(scene, tree_structure, steps, highlight=False):
+    """
+    Replay the steps of one or more RBTreeModel operations.
+    Consecutive recolors are merged into a single TreeStructure.recolor call.
+    """
+    pending_colors = {}
+    for step in steps:
+        if step[0] == "recolor":
+            pending_colors[step[1]] = step[2]
+            continue
+        if pending_colors:
+            tree_structure.recolor(pending_colors)
+            pending_colors = {}
+        apply_step(scene, tree_structure, step, highlight=highlight)
+    
+    if pending_colors:
+        tree_structure.recolor(pending_colors)
+    
+    # Collapse whatever the steps opened up
+    if tree_structure.lod_enabled:
+        tree_structure.refresh_lod()
@@ -0,0 +1,173 @@
+"""
+Render a stream of tree operations into one video.
+
+Reads a JSONL operation log (one ["insert", key[, label]] or ["delete", key]
+per line) from a file or stdin and renders it in chunks of a bounded number
+of operations. The headless model follows the log as it arrives; at the
+start of each chunk its tree is saved as a TreeStructure state file, and the
+chunk is rendered as its own scene starting from that file. Only the current
+tree and the chunks being rendered are held in memory, never the whole log,
+so multi-hour traces can be piped straight in. The chunk videos are joined
+with ffmpeg at the end.
+
+    python stream_render.py trace.jsonl --output media/trace.mp4
+    producer | python stream_render.py - --chunk-size 500 --workers 4
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from parallel_render import QUALITIES, concat_videos, empty_layout, render_segment, write_state
+from rbmodel import RBTreeModel
+
+
+# Accepted operation lengths, including the kind
+OPERATION_LENGTHS = {"insert": (2, 3), "delete": (2,)}
+
+
+def read_operations(stream):
+    """
+    Yield (line number, operation) pairs from a JSONL stream one line at a
+    time, skipping blank lines. Raises ValueError with the line number for a line that is not an
+    ["insert", key[, label]] or ["delete", key] operation.
+    """
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            operation = json.loads(line)
+        except ValueError as error:
+            raise ValueError("Line %d is not valid JSON: %s" % (line_number, error))
+
+        valid = (isinstance(operation, list) and len(operation) >= 2 and isinstance(operation[0], str)
+                 and len(operation) in OPERATION_LENGTHS.get(operation[0], ())
+                 and isinstance(operation[1], (int, float, str)) and not isinstance(operation[1], bool)
+                 and (len(operation) == 2 or isinstance(operation[2], str)))
+        if not valid:
+            raise ValueError('Line %d is not an ["insert", key[, label]] or ["delete", key] operation: %s'
+                             % (line_number, line))
+        yield line_number, tuple(operation)
+
+
+def render_stream(stream, output, chunk_size=200, workers=1, media_root="media/stream",
+                  quality="low_quality", tree_kwargs=None, keep_chunks=False):
+    """
+    Render the operations read from stream in chunks of chunk_size and join
+    them into output. Up to workers chunks render at once; reading pauses
+    while that many are in flight. Chunk media directories are deleted once
+    the video is joined unless keep_chunks is set. Returns a summary dict;
+    one line per chunk is appended to media_root/manifest.jsonl.
+    """
+    layout = empty_layout(tree_kwargs)
+    model = RBTreeModel(record=False)
+    operations = read_operations(stream)
+    manifest_path = os.path.join(media_root, "manifest.jsonl")
+    os.makedirs(media_root, exist_ok=True)
+    open(manifest_path, "w").close()
+
+    start = time.perf_counter()
+    outputs = []
+    failed = []
+    total = 0
+
+    def collect(future, first, stop):
+        entry = future.result()
+        del entry["segment"]
+        entry["operations"] = [first, stop]
+        with open(manifest_path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+        print("operations %7d-%-7d %-6s %8.1fs" % (entry["operations"][0], entry["operations"][1],
+                                                   entry["status"], entry["wall_time"]))
+        if entry["status"] == "ok":
+            outputs.append(entry["output"])
+        else:
+            failed.append(entry)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        try:
+            while True:
+                # The state is saved before the chunk's operations reach the model
+                media_dir = os.path.join(media_root, "chunk_%06d" % (total // chunk_size))
+                write_state(model, layout, media_dir)
+                chunk = []
+                for line_number, operation in operations:
+                    try:
+                        model.apply(operation)
+                    except Exception as error:
+                        raise ValueError("Line %d could not be applied: %s" % (line_number, error))
+                    chunk.append(operation)
+                    if len(chunk) == chunk_size:
+                        break
+                if not chunk:
+                    shutil.rmtree(media_dir)
+                    break
+
+                if len(pending) == workers:
+                    collect(*pending.popleft())
+                future = executor.submit(render_segment, chunk, 0, len(chunk), media_dir, quality, tree_kwargs)
+                pending.append((future, total, total + len(chunk)))
+                total += len(chunk)
+                if len(chunk) < chunk_size:
+                    break
+        except BaseException:
+            # Don't start chunks that were only queued behind a bad line
+            for future, _, _ in pending:
+                future.cancel()
+            raise
+        while pending:
+            collect(*pending.popleft())
+
+    summary = {"operations": total, "chunks": len(outputs) + len(failed), "failed": len(failed)}
+    if outputs and not failed:
+        summary["output"] = concat_videos(outputs, output)
+        if not keep_chunks:
+            for number in range(summary["chunks"]):
+                shutil.rmtree(os.path.join(media_root, "chunk_%06d" % number), ignore_errors=True)
+    summary["wall_time"] = time.perf_counter() - start
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a JSONL operation log in chunks")
+    parser.add_argument("log", nargs="?", default="-", help="JSONL operation log, or - for stdin (default)")
+    parser.add_argument("--output", default="media/stream.mp4", help="joined video")
+    parser.add_argument("--chunk-size", type=int, default=200, help="operations per rendered chunk")
+    parser.add_argument("--workers", type=int, default=1, help="chunks rendered at the same time")
+    parser.add_argument("--quality", choices=QUALITIES, default="low_quality")
+    parser.add_argument("--media-dir", default="media/stream", help="root of the per-chunk media directories")
+    parser.add_argument("--keep-chunks", action="store_true", help="keep the chunk media after joining")
+    args = parser.parse_args()
+
+    if args.chunk_size < 1 or args.workers < 1:
+        parser.error("--chunk-size and --workers must be at least 1")
+
+    stream = sys.stdin if args.log == "-" else open(args.log)
+    try:
+        summary = render_stream(stream, args.output, args.chunk_size, args.workers, args.media_dir,
+                                args.quality, keep_chunks=args.keep_chunks)
+    except ValueError as error:
+        parser.exit(1, "Error: %s\n" % error)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+    if summary["failed"]:
+        print("Failed: %d of %d chunks, see %s" % (summary["failed"], summary["chunks"],
+                                                  os.path.join(args.media_dir, "manifest.jsonl")))
+        sys.exit(1)
+    if "output" in summary:
+        print("Rendered %d operations to %s in %.1fs" % (summary["operations"], summary["output"],
+                                                        summary["wall_time"]))
+    else:
+        print("No operations to render")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""
+Array-backed tree storage.
+
+Keeps a binary tree in flat NumPy arrays instead of per-node Python objects,
+so trees with hundreds of thousands of nodes fit comfortably in memory. Each
+node lives in a slot; slots are tracked by an occupancy mask and freed slots
+are reused:
+
+    occupied[slot]    bool, whether the slot holds a node
+    color[slot]       uint8 code into COLOR_CHARS
+    label_id[slot]    int32 into the label table (labels)
+    left/right/parent int32 slots, NIL (-1) when missing
+    positions[slot]   float64 x, y, z filled in by layout()
+
+Heap indices (root 1, children 2*i and 2*i+1) are derived from the links when
+needed, so rotations only rewire a few slots. There are no mobjects here;
+pass to_tree_data() to TreeStructure.restore to put a tree on screen. Steps
+recorded by RBTreeModel can be replayed with apply_step.
+"""
+import numpy as np
+
+NIL = -1
+COLOR_CHARS = "BROWbG"  # code -> color_char, same letters as TreeNode
+COLOR_CODES = {color_char: code for code, color_char in enumerate(COLOR_CHARS)}
+
+
+class ArrayTree:
+    def __init__(self, capacity=16):
+        self.root = NIL
+        self.size = 0
+        self.labels = []  # label id -> label
+        self._label_ids = {}  # label -> label id
+        self._free = []  # released slots, reused first
+        self._next_slot = 0  # slots from here on have never been used
+
+        self.occupied = np.zeros(0, dtype=bool)
+        self.color = np.zeros(0, dtype=np.uint8)
+        self.label_id = np.zeros(0, dtype=np.int32)
+        self.left = np.zeros(0, dtype=np.int32)
+        self.right = np.zeros(0, dtype=np.int32)
+        self.parent = np.zeros(0, dtype=np.int32)
+        self.positions = np.zeros((0, 3))
+        self._grow(capacity)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def nbytes(self):
+        """Memory used by the node arrays"""
+        arrays = (self.occupied, self.color, self.label_id, self.left, self.right, self.parent, self.positions)
+        return sum(array.nbytes for array in arrays)
+
+    def _grow(self, capacity):
+        def resized(array, fill):
+            new = np.full((capacity,) + array.shape[1:], fill, dtype=array.dtype)
+            new[:len(array)] = array
+            return new
+
+        self.occupied = resized(self.occupied, False)
+        self.color = resized(self.color, 0)
+        self.label_id = resized(self.label_id, 0)
+        self.left = resized(self.left, NIL)
+        self.right = resized(self.right, NIL)
+        self.parent = resized(self.parent, NIL)
+        self.positions = resized(self.positions, 0.0)
+
+    # Slots
+
+    def new_node(self, label, color_char="R"):
+        """Store a detached node and return its slot"""
+        if self._free:
+            slot = self._free.pop()
+        else:
+            if self._next_slot == len(self.occupied):
+                self._grow(max(16, 2 * len(self.occupied)))
+            slot = self._next_slot
+            self._next_slot += 1
+
+        label_id = self._label_ids.get(label)
+        if label_id is None:
+            label_id = self._label_ids[label] = len(self.labels)
+            self.labels.append(label)
+
+        self.occupied[slot] = True
+        self.color[slot] = COLOR_CODES[color_char]
+        self.label_id[slot] = label_id
+        self.left[slot] = self.right[slot] = self.parent[slot] = NIL
+        self.size += 1
+        return slot
+
+    def _release(self, slot):
+        self.occupied[slot] = False
+        self.left[slot] = self.right[slot] = self.parent[slot] = NIL
+        self._free.append(slot)
+        self.size -= 1
+
+    def label(self, slot):
+        return self.labels[self.label_id[slot]]
+
+    def color_char(self, slot):
+        return COLOR_CHARS[self.color[slot]]
+
+    def set_color(self, slot, color_char):
+        self.color[slot] = COLOR_CODES[color_char]
+
+    # Links
+
+    def attach(self, parent, slot, right):
+        """Hang slot below parent (as the right child if right), or make it the root if parent is NIL"""
+        self.parent[slot] = parent
+        if parent == NIL:
+            self.root = slot
+        elif right:
+            self.right[parent] = slot
+        else:
+            self.left[parent] = slot
+
+    def _replace_child(self, old, new):
+        """Put new (possibly NIL) where old hangs from its parent"""
+        parent = int(self.parent[old])
+        if new != NIL:
+            self.parent[new] = parent
+        if parent == NIL:
+            self.root = new
+        elif self.left[parent] == old:
+            self.left[parent] = new
+        else:
+            self.right[parent] = new
+
+    def slot_at(self, index):
+        """Slot at a heap index, or NIL if there is no node there"""
+        slot = self.root
+        for bit in bin(index)[3:]:
+            if slot == NIL:
+                break
+            slot = int(self.right[slot] if bit == "1" else self.left[slot])
+        return slot
+
+    def index_of(self, slot):
+        """Heap index of a slot, found by walking up to the root"""
+        path = []
+        while self.parent[slot] != NIL:
+            parent = int(self.parent[slot])
+            path.append(self.right[parent] == slot)
+            slot = parent
+
+        index = 1
+        for is_right in reversed(path):
+            index = 2 * index + int(is_right)
+        return index
+
+    # Rotations and removal
+
+    def rotate_left(self, x):
+        y = int(self.right[x])
+        self.right[x] = self.left[y]
+        if self.left[y] != NIL:
+            self.parent[self.left[y]] = x
+        self._replace_child(x, y)
+        self.left[y] = x
+        self.parent[x] = y
+
+    def rotate_right(self, x):
+        y = int(self.left[x])
+        self.left[x] = self.right[y]
+        if self.right[y] != NIL:
+            self.parent[self.right[y]] = x
+        self._replace_child(x, y)
+        self.right[y] = x
+        self.parent[x] = y
+
+    def swap_values(self, a, b):
+        """Exchange the labels of two slots"""
+        self.label_id[a], self.label_id[b] = self.label_id[b], self.label_id[a]
+
+    def remove(self, slot):
+        """Remove a node with at most one child; the child takes its place"""
+        if self.left[slot] != NIL and self.right[slot] != NIL:
+            raise ValueError("Slot %d has two children" % slot)
+        child = int(self.left[slot] if self.left[slot] != NIL else self.right[slot])
+        self._replace_child(slot, child)
+        self._release(slot)
+
+    def apply_step(self, step):
+        """Replay one primitive step produced by RBTreeModel"""
+        kind = step[0]
+        if kind == "insert":
+            _, index, label, color_char = step
+            parent = self.slot_at(index // 2) if index > 1 else NIL
+            self.attach(parent, self.new_node(label, color_char), index % 2 == 1)
+        elif kind == "recolor":
+            self.set_color(self.slot_at(step[1]), step[2])
+        elif kind == "rotate_left":
+            self.rotate_left(self.slot_at(step[1]))
+        elif kind == "rotate_right":
+            self.rotate_right(self.slot_at(step[1]))
+        elif kind == "swap_values":
+            self.swap_values(self.slot_at(step[1]), self.slot_at(step[2]))
+        elif kind == "remove":
+            self.remove(self.slot_at(step[1]))
+        else:
+            raise ValueError("Unknown step: %r" % (kind,))
+
+    # Traversals
+
+    def preorder(self, slot=None):
+        """Slots of a subtree (default: the whole tree) in preorder"""
+        stack = [self.root if slot is None else slot]
+        while stack:
+            slot = stack.pop()
+            if slot == NIL:
+                continue
+            yield slot
+            stack.append(int(self.right[slot]))
+            stack.append(int(self.left[slot]))
+
+    def inorder(self, slot=None):
+        """Slots of a subtree (default: the whole tree) in sorted order"""
+        stack = []
+        slot = self.root if slot is None else slot
+        while stack or slot != NIL:
+            while slot != NIL:
+                stack.append(slot)
+                slot = int(self.left[slot])
+            slot = stack.pop()
+            yield slot
+            slot = int(self.right[slot])
+
+    def levels(self):
+        """
+        Yield (slots, heap indices) arrays one level at a time, top down.
+        Indices are int64 down to depth 62 and Python ints (object dtype)
+        below that, where int64 would overflow.
+        """
+        if self.root == NIL:
+            return
+        slots = np.array([self.root], dtype=np.int32)
+        indices = np.array([1], dtype=np.int64)
+        depth = 0
+        while len(slots):
+            yield slots, indices
+            if depth == 62:
+                indices = indices.astype(object)
+            depth += 1
+            left = self.left[slots]
+            right = self.right[slots]
+            has_left = left != NIL
+            has_right = right != NIL
+            slots = np.concatenate([left[has_left], right[has_right]])
+            indices = np.concatenate([2 * indices[has_left], 2 * indices[has_right] + 1])
+
+    def heap_indices(self):
+        """(slots, heap indices) arrays for every node, in level order"""
+        pairs = list(self.levels())
+        if not pairs:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int64)
+        return np.concatenate([slots for slots, _ in pairs]), np.concatenate([indices for _, indices in pairs])
+
+    def layout(self, root_pos=(0.0, 2.3, 0.0), h_spacing=5.0, v_spacing=1.2):
+        """
+        Fill positions for every node with the same closed-form layout as
+        TreeStructure and return the positions array (indexed by slot).
+        """
+        slots, indices = self.heap_indices()
+        # Level order, so the last index is one of the deepest
+        if not len(indices) or int(indices[-1]).bit_length() <= 53:
+            # Exactly representable as float64, so do everything in NumPy
+            depth = np.frexp(indices.astype(np.float64))[1] - 1
+            offset = (2 * indices + 1) / np.exp2(depth) - 3
+        else:
+            # Python ints divide exactly
+            depth = np.array([index.bit_length() - 1 for index in map(int, indices)], dtype=np.float64)
+            offset = np.array([(2 * index + 1) / (1 << (index.bit_length() - 1)) - 3
+                               for index in map(int, indices)])
+
+        self.positions[slots, 0] = root_pos[0] + h_spacing * offset
+        self.positions[slots, 1] = root_pos[1] - v_spacing * depth
+        self.positions[slots, 2] = root_pos[2]
+        return self.positions
+
+    # Conversion
+
+    def to_tree_data(self):
+        """Return the tree as {heap index: (label, color_char)}, like TreeStructure.tree_data"""
+        slots, indices = self.heap_indices()
+        return {int(index): (self.labels[label_id], COLOR_CHARS[code])
+                for index, label_id, code in zip(indices, self.label_id[slots], self.color[slots])}
+
+    @classmethod
+    def from_tree_data(cls, tree_data):
+        """Build an ArrayTree from {heap index: (label, color_char)}"""
+        tree = cls(capacity=max(16, len(tree_data)))
+        slots = {}
+        for index in sorted(tree_data):
+            label, color_char = tree_data[index]
+            parent = slots.get(index // 2, NIL)
+            if index != 1 and parent == NIL:
+                raise ValueError("Node %d has no parent in tree_data" % index)
+            slots[index] = slot = tree.new_node(label, color_char)
+            tree.attach(parent, slot, index % 2 == 1)
+        return tree